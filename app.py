@@ -5,21 +5,50 @@ import logging
 import os
 import fcntl
 import random
-import pytz
 import re
-from telegram import Update, BotCommand, InlineKeyboardButton, InlineKeyboardMarkup
+import functools
+import unicodedata
+import heapq
+import hashlib
+import hmac
+import time
+import contextlib
+import importlib.util
+import cProfile
+import pstats
+import marshal
+import collections
+from telegram import (
+    Update,
+    BotCommand,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQueryResultArticle,
+    InlineQueryResultsButton,
+    InputFile,
+    InputTextMessageContent,
+)
+from telegram.constants import ChatType
 from telegram.ext import (
     Application, 
     CommandHandler, 
     ContextTypes,
     ConversationHandler,
     CallbackQueryHandler,
+    InlineQueryHandler,
+    BasePersistence,
+    PersistenceInput,
+    BaseUpdateProcessor,
     MessageHandler,
+    TypeHandler,
     filters
 )
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+from telegram.request import BaseRequest, HTTPXRequest
 import signal
 import sys
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Set, Tuple, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "8466519086:AAEMZmSACSrOnXWAf0txTc--_aioBkzBU9U")
 DEFAULT_GROUP_ID = -123456789
@@ -31,7 +60,53 @@ if not TOKEN:
 
 DATA_DIR = "group_data"
 LOCK_FILE = "bot.lock"
-ARMENIA_TZ = pytz.timezone('Asia/Yerevan')
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "20"))
+PERSISTENCE_FILE = os.path.join(DATA_DIR, "persistence.json")
+PERSISTENCE_FLUSH_DELAY = float(os.getenv("PERSISTENCE_FLUSH_DELAY", "5"))
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "8"))
+MAX_ADMITTED_UPDATES = int(os.getenv("MAX_ADMITTED_UPDATES", "256"))
+SEND_POOL_SIZE = int(os.getenv("SEND_POOL_SIZE", "8"))
+SEND_POOL_TIMEOUT = float(os.getenv("SEND_POOL_TIMEOUT", "5"))
+CONNECT_TIMEOUT = float(os.getenv("CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("READ_TIMEOUT", "10"))
+WRITE_TIMEOUT = float(os.getenv("WRITE_TIMEOUT", "10"))
+USE_HTTP2 = os.getenv("USE_HTTP2", "0") == "1"
+STORAGE_MODE = os.getenv("STORAGE_MODE", "json")  # "json" or "journal"
+JOURNAL_COMPACT_EVERY = int(os.getenv("JOURNAL_COMPACT_EVERY", "200"))
+PRERENDER_MINUTES = int(os.getenv("PRERENDER_MINUTES", "5"))
+REMINDER_CONCURRENCY = int(os.getenv("REMINDER_CONCURRENCY", "8"))
+REMINDER_RATE = float(os.getenv("REMINDER_RATE", "25"))  # messages per second
+REMINDER_RETRY_MINUTES = int(os.getenv("REMINDER_RETRY_MINUTES", "10"))
+DASHBOARD_DEBOUNCE = float(os.getenv("DASHBOARD_DEBOUNCE", "10"))
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "60"))
+CALENDAR_PORT = int(os.getenv("CALENDAR_PORT", "0"))  # 0 disables the HTTP feed
+CALENDAR_HOST = os.getenv("CALENDAR_HOST", "0.0.0.0")
+CALENDAR_BASE_URL = os.getenv("CALENDAR_BASE_URL", "")
+LESSON_MINUTES = int(os.getenv("LESSON_MINUTES", "80"))
+DEFAULT_LESSON_TIMES = ["09:30", "11:00", "12:50", "14:20", "15:50", "17:20"]
+MAX_MESSAGE_LENGTH = 4096  # Telegram's limit, in UTF-16 code units
+USER_RATE = float(os.getenv("USER_RATE", "0.2"))  # tokens refilled per second
+USER_BURST = float(os.getenv("USER_BURST", "5"))
+CHAT_RATE = float(os.getenv("CHAT_RATE", "0.5"))
+CHAT_BURST = float(os.getenv("CHAT_BURST", "12"))
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "3"))
+ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()}
+PERF_MAX_SECONDS = 120
+BROADCAST_FILE = os.path.join(DATA_DIR, "broadcast.json")
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "4"))
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "20"))  # messages per second
+BROADCAST_CHECKPOINT_EVERY = 25
+DATA_WATCH_INTERVAL = float(os.getenv("DATA_WATCH_INTERVAL", "0"))  # seconds, 0 disables the watcher
+# "command:cost,..." overrides, commands not listed cost 1
+COMMAND_COSTS = {"motivate": 2, "kys": 2, "full_timetable": 2, "calendar": 3}
+COMMAND_COSTS.update(
+    (name.strip(), float(cost))
+    for name, _, cost in (item.partition(":") for item in os.getenv("COMMAND_COSTS", "").split(",") if item)
+)
+BLOB_DIR = os.path.join(DATA_DIR, "blobs")
+BLOB_THRESHOLD = int(os.getenv("BLOB_THRESHOLD", "200"))
+PREVIEW_LENGTH = 80
+DEFAULT_TIMEZONE = "Asia/Yerevan"
 
 os.makedirs(DATA_DIR, exist_ok=True)
 
@@ -42,6 +117,8 @@ logging.basicConfig(
 )
 
 logger = logging.getLogger(__name__)
+# httpx logs every request at INFO, including the bot token in the URL
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
 SETTING_TIMETABLE = 0 
 LONG_ADDING_SUBJECT, LONG_ADDING_TASK, LONG_ADDING_DATE = range(1, 4) 
@@ -51,6 +128,36 @@ reminder_task = None
 shutdown_event = asyncio.Event()
 lock_file = None
 last_reminder_data = {}
+# reminder key -> (chat_id, kind, day, first fire time) of sends to try again next minute
+reminder_retries: Dict[str, Tuple[int, str, datetime.date, datetime.datetime]] = {}
+shutdown_task = None
+chat_locks: Dict[int, asyncio.Lock] = {}
+journal_state: Dict[int, Dict[str, int]] = {}
+chat_zones: Dict[int, ZoneInfo] = {}
+search_indexes: Dict[int, "HomeworkIndex"] = {}
+subject_registries: Dict[int, "SubjectRegistry"] = {}
+sorted_subjects_cache: Dict[int, List[str]] = {}
+reminder_schedule: Optional[List[Tuple[int, str, str, bool]]] = None
+dashboard_chats: Set[int] = set()  # built together with reminder_schedule
+prerendered_digests: Dict[Tuple[int, str, str], Optional[str]] = {}
+reminder_latency = {"fires": 0, "delivered": 0, "failed": 0, "max_ms": 0.0}
+dashboard_timers: Dict[int, asyncio.Task] = {}
+dashboard_hashes: Dict[int, str] = {}
+inline_answers: Dict[Tuple[int, str], Tuple[float, str]] = {}
+calendar_feeds: Dict[int, Tuple[int, str, bytes]] = {}
+calendar_file_ids: Dict[int, Tuple[str, str]] = {}
+calendar_server = None
+rate_buckets: Dict[Tuple[str, int], "TokenBucket"] = {}
+recent_commands: Dict[Tuple[int, str, Tuple[str, ...]], float] = {}
+throttle_notices: Dict[Tuple[int, int], float] = {}
+rate_limit_metrics = {"allowed": 0, "coalesced": 0, "throttled": 0, "dropped": 0}
+rate_limit_by_command: Dict[str, int] = {}
+storage_io = {"reads": 0, "read_ms": 0.0, "writes": 0, "write_ms": 0.0}
+perf_task = None
+watch_task = None
+broadcast_task = None
+broadcast_progress: Optional[Dict[str, Any]] = None
+data_mtimes: Dict[str, int] = {}
 
 INITIAL_TIMETABLE: Dict[str, List[Dict[str, str]]] = {
     "Monday": [
@@ -93,12 +200,129 @@ def escape_markdown_v2(text: str) -> str:
 def get_homework_file(chat_id: int) -> str:
     return os.path.join(DATA_DIR, f"homework_{chat_id}.json")
 
+def get_snapshot_file(chat_id: int) -> str:
+    return os.path.join(DATA_DIR, f"homework_{chat_id}.snapshot.json")
+
+def get_journal_file(chat_id: int) -> str:
+    return os.path.join(DATA_DIR, f"homework_{chat_id}.journal")
+
+TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """Casefolded word tokens; Unicode \\w matches Latin, Cyrillic and Armenian letters alike"""
+    text = unicodedata.normalize("NFKC", text).casefold().replace("ё", "е")
+    return [token[:64] for token in TOKEN_RE.findall(text)]
+
+class HomeworkIndex:
+    """Inverted index over one chat's homework.
+
+    Documents keep the subject and per-subject position of each task so
+    results can be shown with the same IDs as /hw_list and /hw_remove.
+    """
+
+    SUBJECT_WEIGHT = 2
+    MATCH_BONUS = 1 << 20
+
+    def __init__(self, hw: Dict):
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.docs: Dict[int, Tuple[str, Dict]] = {}
+        self.subject_docs: Dict[str, List[int]] = {}
+        self._sorted_subjects: Optional[List[str]] = None
+        self._next_id = 0
+        for subject, tasks in hw.items():
+            for task in tasks:
+                self.add(subject, task)
+
+    def _doc_terms(self, subject: str, task: Dict) -> Dict[str, int]:
+        terms: Dict[str, int] = {}
+        for token in tokenize(get_task_text(task)):
+            terms[token] = terms.get(token, 0) + 1
+        for token in tokenize(subject):
+            terms[token] = terms.get(token, 0) + self.SUBJECT_WEIGHT
+        return terms
+
+    def add(self, subject: str, task: Dict):
+        doc_id = self._next_id
+        self._next_id += 1
+        self.docs[doc_id] = (subject, task)
+        if subject not in self.subject_docs:
+            self._sorted_subjects = None
+        self.subject_docs.setdefault(subject, []).append(doc_id)
+        for term, weight in self._doc_terms(subject, task).items():
+            self.postings.setdefault(term, {})[doc_id] = weight
+
+    def remove(self, subject: str, index: int):
+        doc_ids = self.subject_docs[subject]
+        doc_id = doc_ids.pop(index)
+        if not doc_ids:
+            del self.subject_docs[subject]
+            self._sorted_subjects = None
+        subject, task = self.docs.pop(doc_id)
+        for term in self._doc_terms(subject, task):
+            postings = self.postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+
+    def sorted_subjects(self) -> List[str]:
+        if self._sorted_subjects is None:
+            self._sorted_subjects = sorted(self.subject_docs)
+        return self._sorted_subjects
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, int, str, Dict]]:
+        """Best matches as (subject_id, task_id, subject, task), both IDs 1-based.
+
+        Tasks matching more query terms rank first, then by summed term weight.
+        """
+        # One matched term always outweighs any summed weight
+        scores: Dict[int, int] = {}
+        for term in set(tokenize(query)):
+            for doc_id, weight in self.postings.get(term, {}).items():
+                scores[doc_id] = scores.get(doc_id, 0) + self.MATCH_BONUS + weight
+        
+        ranked = heapq.nsmallest(limit, scores, key=lambda doc_id: (-scores[doc_id], doc_id))
+        subject_ids = {subject: i for i, subject in enumerate(self.sorted_subjects(), 1)}
+        results = []
+        for doc_id in ranked:
+            subject, task = self.docs[doc_id]
+            task_id = self.subject_docs[subject].index(doc_id) + 1
+            results.append((subject_ids[subject], task_id, subject, task))
+        return results
+
+def get_search_index(chat_id: int) -> HomeworkIndex:
+    index = search_indexes.get(chat_id)
+    if index is None:
+        index = search_indexes[chat_id] = HomeworkIndex(load_homework(chat_id))
+    return index
+
+def update_search_index(chat_id: int, record: Dict[str, Any]):
+    index = search_indexes.get(chat_id)
+    if index is None:
+        return
+    if record["op"] == "add":
+        index.add(record["subject"], record["item"])
+    elif record["op"] == "remove":
+        index.remove(record["subject"], record["index"])
+    else:
+        # Bulk changes are rare, rebuild on the next search
+        del search_indexes[chat_id]
+
 def get_config_file(chat_id: int) -> str:
     return os.path.join(DATA_DIR, f"config_{chat_id}.json")
 
+@contextlib.contextmanager
+def timed_io(kind: str):
+    """Count a storage "read" or "write" and its duration in storage_io"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        storage_io[f"{kind}s"] += 1
+        storage_io[f"{kind}_ms"] += (time.perf_counter() - started) * 1000
+
 def load_json_file(filename: str) -> Dict:
     try:
-        with open(filename, "r", encoding="utf-8") as f:
+        with timed_io("read"), open(filename, "r", encoding="utf-8") as f:
             return json.load(f)
     except FileNotFoundError:
         return {}
@@ -108,16 +332,289 @@ def load_json_file(filename: str) -> Dict:
 
 def save_json_file(filename: str, data: Dict):
     try:
-        with open(filename, "w", encoding="utf-8") as f:
+        with timed_io("write"), open(filename, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
+        note_own_write(filename)
     except Exception as e:
         logger.error(f"Error saving {filename}: {e}")
 
 def load_homework(chat_id: int):
+    if STORAGE_MODE == "journal":
+        return load_journaled_homework(chat_id)
     return load_json_file(get_homework_file(chat_id))
 
+def get_blob_file(digest: str) -> str:
+    return os.path.join(BLOB_DIR, f"{digest}.txt")
+
+def store_blob(text: str) -> str:
+    """Store text once under its sha256, shared by every chat"""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    blob_file = get_blob_file(digest)
+    if not os.path.exists(blob_file):
+        os.makedirs(BLOB_DIR, exist_ok=True)
+        tmp_file = f"{blob_file}.{os.getpid()}.tmp"
+        with timed_io("write"):
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_file, blob_file)
+    return digest
+
+@functools.lru_cache(maxsize=256)
+def load_blob(digest: str) -> str:
+    try:
+        with timed_io("read"), open(get_blob_file(digest), "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception as e:
+        logger.error(f"Error loading blob {digest}: {e}")
+        return ""
+
+def externalize_task(item: Dict) -> Dict:
+    """Move a task body over BLOB_THRESHOLD chars to the blob store.
+
+    The item keeps the hash, the first PREVIEW_LENGTH chars and the full
+    length, which is all listings need.
+    """
+    text = item.get("task")
+    if text is None or len(text) <= BLOB_THRESHOLD:
+        return item
+    try:
+        digest = store_blob(text)
+    except Exception as e:
+        logger.error(f"Error storing task body, keeping it inline: {e}")
+        return item
+    del item["task"]
+    item["task_ref"] = digest
+    item["preview"] = text[:PREVIEW_LENGTH]
+    item["length"] = len(text)
+    return item
+
+def make_task_item(task: str, due: str, added: str) -> Dict:
+    return externalize_task({"task": task, "due": due, "added": added})
+
+def get_task_text(item: Dict) -> str:
+    if "task" in item:
+        return item["task"]
+    return load_blob(item["task_ref"])
+
+def task_preview(item: Dict, length: int) -> str:
+    """First length chars (length <= PREVIEW_LENGTH) without reading the blob"""
+    text = item.get("task", item.get("preview", ""))
+    full_length = item.get("length", len(text))
+    return text[:length] if full_length <= length else text[:length] + "..."
+
 def save_homework(chat_id: int, hw: Dict):
-    save_json_file(get_homework_file(chat_id), hw)
+    # Long bodies written before the blob store existed move out on the next full write
+    for tasks in hw.values():
+        for item in tasks:
+            externalize_task(item)
+    
+    if STORAGE_MODE == "journal":
+        compact_homework(chat_id, hw)
+    else:
+        save_json_file(get_homework_file(chat_id), hw)
+
+def clean_homework(hw: Dict, cutoff: datetime.date) -> int:
+    """Drop tasks due before cutoff, returns the number removed"""
+    cleaned = 0
+    for subject in list(hw.keys()):
+        keep = []
+        for task in hw[subject]:
+            if task["due"] == "TBD":
+                keep.append(task)
+                continue
+
+            try:
+                due = datetime.datetime.strptime(task["due"], "%Y-%m-%d").date()
+                if due >= cutoff:
+                    keep.append(task)
+                else:
+                    cleaned += 1
+            except ValueError:
+                keep.append(task)
+
+        if keep:
+            hw[subject] = keep
+        else:
+            del hw[subject]
+    return cleaned
+
+def apply_homework_mutation(hw: Dict, record: Dict[str, Any]) -> Any:
+    op = record["op"]
+    if op == "add":
+        hw.setdefault(record["subject"], []).append(record["item"])
+    elif op == "remove":
+        subject = record["subject"]
+        removed = hw[subject].pop(record["index"])
+        if not hw[subject]:
+            del hw[subject]
+        return removed
+    elif op == "clean":
+        return clean_homework(hw, datetime.date.fromisoformat(record["cutoff"]))
+    else:
+        raise ValueError(f"Unknown homework mutation: {op}")
+
+def mutate_homework(chat_id: int, hw: Dict, record: Dict[str, Any]) -> Any:
+    """Apply a mutation record (add/remove/clean) to hw and persist it"""
+    result = apply_homework_mutation(hw, record)
+    if record["op"] == "clean" and not result:
+        return result
+
+    if STORAGE_MODE == "journal":
+        append_journal(chat_id, hw, record)
+    else:
+        save_homework(chat_id, hw)
+    update_search_index(chat_id, record)
+    sorted_subjects_cache.pop(chat_id, None)
+    invalidate_rendered(chat_id)
+    schedule_dashboard_update(chat_id)
+    return result
+
+def invalidate_rendered(chat_id: int):
+    """Drop reminder digests, inline answers, the calendar feed and coalesced commands
+    after the chat's data changed"""
+    for key in [key for key in prerendered_digests if key[0] == chat_id]:
+        del prerendered_digests[key]
+    for key in [key for key in inline_answers if key[0] == chat_id]:
+        del inline_answers[key]
+    calendar_feeds.pop(chat_id, None)
+    # A repeat of a read command must show the change instead of being swallowed
+    for key in [key for key in recent_commands if key[0] == chat_id]:
+        del recent_commands[key]
+
+def invalidate_chat(chat_id: int):
+    """Forget everything cached from the chat's files after they changed outside the bot"""
+    chat_zones.pop(chat_id, None)
+    subject_registries.pop(chat_id, None)
+    search_indexes.pop(chat_id, None)
+    sorted_subjects_cache.pop(chat_id, None)
+    journal_state.pop(chat_id, None)
+    parse_date_text.cache_clear()
+    invalidate_rendered(chat_id)
+
+def reload_data(reason: str):
+    """Drop every cache built from DATA_DIR, the next access reads the files again"""
+    global reminder_schedule
+    for cache in (
+        chat_zones, subject_registries, search_indexes, sorted_subjects_cache,
+        journal_state, prerendered_digests, inline_answers, calendar_feeds,
+    ):
+        cache.clear()
+    reminder_schedule = None
+    parse_date_text.cache_clear()
+    logger.info(f"Reloaded configs and homework from {DATA_DIR} ({reason})")
+
+def get_sorted_subjects(chat_id: int, hw: Dict) -> List[str]:
+    """Subjects in /hw_list order, cached until the chat's homework changes"""
+    cached = sorted_subjects_cache.get(chat_id)
+    if cached is None or len(cached) != len(hw):
+        cached = sorted_subjects_cache[chat_id] = sorted(hw.keys())
+    return cached
+
+def load_journaled_homework(chat_id: int) -> Dict:
+    """Snapshot plus every journal record newer than it.
+
+    A torn record at the end of the journal (crash mid-append) is cut off so
+    the next append starts on a clean line. A bad record anywhere else stops
+    the replay there and leaves the file untouched.
+    """
+    snapshot = load_json_file(get_snapshot_file(chat_id))
+    if snapshot:
+        hw, seq = snapshot.get("homework", {}), snapshot.get("seq", 0)
+    else:
+        # First start in journal mode: the plain homework file is the base
+        hw, seq = load_json_file(get_homework_file(chat_id)), 0
+
+    journal_file = get_journal_file(chat_id)
+    entries = 0
+    damaged = False
+    try:
+        with open(journal_file, "rb") as f:
+            data = f.read()
+        offset = 0
+        for line in data.splitlines(keepends=True):
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("missing newline")
+                record = json.loads(line)
+            except ValueError:
+                if offset + len(line) == len(data):
+                    logger.warning(f"Truncating torn journal record in {journal_file} at byte {offset}")
+                    with open(journal_file, "rb+") as f:
+                        f.truncate(offset)
+                    note_own_write(journal_file)
+                else:
+                    logger.error(
+                        f"Corrupt journal record in {journal_file} at byte {offset}, "
+                        f"replay stopped there, later records are kept on disk"
+                    )
+                    damaged = True
+                break
+            offset += len(line)
+            if record["seq"] <= seq:
+                continue
+            apply_homework_mutation(hw, record)
+            seq = record["seq"]
+            entries += 1
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.error(f"Error replaying {journal_file}: {e}")
+
+    journal_state[chat_id] = {"seq": seq, "entries": entries, "damaged": damaged}
+    return hw
+
+def append_journal(chat_id: int, hw: Dict, record: Dict[str, Any]):
+    """Append a compact mutation record, compacting every JOURNAL_COMPACT_EVERY entries"""
+    if chat_id not in journal_state:
+        load_journaled_homework(chat_id)
+    state = journal_state[chat_id]
+    if state["damaged"]:
+        # Never append behind a corrupt record, start over from a snapshot instead
+        save_homework(chat_id, hw)
+        return
+
+    state["seq"] += 1
+    line = json.dumps({**record, "seq": state["seq"]}, ensure_ascii=False, separators=(",", ":"))
+    try:
+        with timed_io("write"), open(get_journal_file(chat_id), "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        note_own_write(get_journal_file(chat_id))
+    except Exception as e:
+        logger.error(f"Error appending to {get_journal_file(chat_id)}: {e}")
+        return
+
+    state["entries"] += 1
+    if state["entries"] >= JOURNAL_COMPACT_EVERY:
+        save_homework(chat_id, hw)
+
+def compact_homework(chat_id: int, hw: Dict):
+    """Write hw as the new snapshot, then empty the journal.
+
+    The snapshot records the last journal seq it contains, so a crash between
+    the two steps only leaves records that replay will skip. A journal with a
+    corrupt record is moved aside instead of emptied, for manual recovery.
+    """
+    if chat_id not in journal_state:
+        load_journaled_homework(chat_id)
+    state = journal_state[chat_id]
+
+    snapshot_file = get_snapshot_file(chat_id)
+    tmp_file = snapshot_file + ".tmp"
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"seq": state["seq"], "homework": hw}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_file, snapshot_file)
+        if state["damaged"]:
+            damaged_file = f"{get_journal_file(chat_id)}.damaged-{time.time_ns()}"
+            os.replace(get_journal_file(chat_id), damaged_file)
+            logger.error(f"Moved damaged journal to {damaged_file}, records after the corrupt one were not replayed")
+            state["damaged"] = False
+        open(get_journal_file(chat_id), "w").close()
+        note_own_write(snapshot_file)
+        note_own_write(get_journal_file(chat_id))
+        state["entries"] = 0
+    except Exception as e:
+        logger.error(f"Error compacting homework for {chat_id}: {e}")
 
 def load_group_config(chat_id: int) -> Dict[str, Any]:
     config = load_json_file(get_config_file(chat_id))
@@ -127,7 +624,7 @@ def load_group_config(chat_id: int) -> Dict[str, Any]:
             "reminders_enabled": True,
             "morning_reminder": "08:00",
             "evening_reminder": "18:00",
-            "timezone": "Asia/Yerevan",
+            "timezone": DEFAULT_TIMEZONE,
         }
 
     if "timetable" not in config:
@@ -135,12 +632,16 @@ def load_group_config(chat_id: int) -> Dict[str, Any]:
             config["timetable"] = INITIAL_TIMETABLE
         else:
             config["timetable"] = {}
+        # Only write back when defaults were filled in
+        save_group_config(chat_id, config)
 
-    save_group_config(chat_id, config)
     return config
 
 def save_group_config(chat_id: int, config: Dict[str, Any]):
+    global reminder_schedule
     save_json_file(get_config_file(chat_id), config)
+    reminder_schedule = None
+    invalidate_rendered(chat_id)
 
 def load_group_timetable(chat_id: int) -> Dict[str, List[Dict[str, str]]]:
     config = load_group_config(chat_id)
@@ -150,10 +651,514 @@ def save_group_timetable(chat_id: int, timetable: Dict[str, List[Dict[str, str]]
     config = load_group_config(chat_id)
     config["timetable"] = timetable
     save_group_config(chat_id, config)
+    subject_registries.pop(chat_id, None)
+    parse_date_text.cache_clear()
+
+def normalize_subject(name: str) -> str:
+    """Casefolded with runs of whitespace collapsed, punctuation is kept so C, C# and C++ differ"""
+    return " ".join(name.casefold().split())
+
+class SubjectRegistry:
+    """Canonical subject names of one chat with their normalized aliases.
+
+    The canonical name is the homework key. Aliases are looked up exactly,
+    and a prefix trie resolves unambiguous abbreviations for lookups.
+    """
+
+    def __init__(self):
+        self.aliases: Dict[str, str] = {}
+        self.trie: Dict[str, Any] = {}
+
+    def add_alias(self, alias: str, canonical: str):
+        key = normalize_subject(alias)
+        if not key or key in self.aliases:
+            return
+        self.aliases[key] = canonical
+        node = self.trie
+        for ch in key:
+            node = node.setdefault(ch, {})
+            # "" never collides with a single character edge
+            node.setdefault("", set()).add(canonical)
+
+    def canonical(self, name: str) -> str:
+        """Canonical name for a subject being added, registering it if new"""
+        name = name.strip()
+        found = self.aliases.get(normalize_subject(name))
+        if found is None:
+            self.add_alias(name, name)
+            # A new subject can make a cached "next <prefix>" lookup ambiguous
+            parse_date_text.cache_clear()
+            return name
+        return found
+
+    def resolve(self, text: str) -> Optional[str]:
+        key = normalize_subject(text)
+        if not key:
+            return None
+        if key in self.aliases:
+            return self.aliases[key]
+        node = self.trie
+        for ch in key:
+            node = node.get(ch)
+            if node is None:
+                return None
+        matches = node.get("", set())
+        return next(iter(matches)) if len(matches) == 1 else None
+
+def get_subject_registry(chat_id: int, hw: Dict = None) -> SubjectRegistry:
+    """Seeded from existing homework keys, timetable subjects and configured aliases.
+
+    Homework keys go first so a timetable spelling ("Python") never takes
+    over a bucket that already holds tasks ("python").
+    """
+    registry = subject_registries.get(chat_id)
+    if registry is None:
+        registry = SubjectRegistry()
+        for subject in sorted(hw if hw is not None else load_homework(chat_id)):
+            registry.add_alias(subject, subject)
+        config = load_group_config(chat_id)
+        for lessons in config.get("timetable", {}).values():
+            for lesson in lessons:
+                subject = lesson.get("subject", "").strip()
+                if subject:
+                    registry.add_alias(subject, subject)
+        for alias, subject in config.get("subject_aliases", {}).items():
+            registry.add_alias(subject, subject)
+            registry.add_alias(alias, registry.aliases.get(normalize_subject(subject), subject))
+        subject_registries[chat_id] = registry
+    return registry
+
+class FileStoragePersistence(BasePersistence):
+    """Keeps conversation states and user_data in PERSISTENCE_FILE.
+
+    Changes are buffered in memory and written once PERSISTENCE_FLUSH_DELAY
+    seconds have passed since the first unsaved change, or on flush().
+    """
+
+    def __init__(self, filename: str = PERSISTENCE_FILE, flush_delay: float = PERSISTENCE_FLUSH_DELAY):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=flush_delay,
+        )
+        self.filename = filename
+        self.flush_delay = flush_delay
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        data = load_json_file(filename)
+        self.user_data: Dict[int, Dict] = {
+            int(user_id): user_data for user_id, user_data in data.get("user_data", {}).items()
+        }
+        self.conversations: Dict[str, Dict[Tuple, object]] = {
+            name: {tuple(key): state for key, state in entries}
+            for name, entries in data.get("conversations", {}).items()
+        }
+
+    def _write(self):
+        self._flush_handle = None
+        data = {
+            "user_data": {str(user_id): user_data for user_id, user_data in self.user_data.items() if user_data},
+            "conversations": {
+                name: [[list(key), state] for key, state in entries.items()]
+                for name, entries in self.conversations.items()
+            },
+        }
+        save_json_file(self.filename, data)
+
+    def _schedule_write(self):
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.flush_delay, self._write)
+
+    async def get_user_data(self) -> Dict[int, Dict]:
+        return self.user_data
+
+    async def get_chat_data(self) -> Dict[int, Dict]:
+        return {}
+
+    async def get_bot_data(self) -> Dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> Dict[Tuple, object]:
+        return dict(self.conversations.get(name, {}))
+
+    async def update_conversation(self, name: str, key: Tuple, new_state: Optional[object]):
+        entries = self.conversations.setdefault(name, {})
+        if entries.get(key) == new_state:
+            return
+        if new_state is None:
+            entries.pop(key, None)
+        else:
+            entries[key] = new_state
+        self._schedule_write()
+
+    async def update_user_data(self, user_id: int, data: Dict):
+        if self.user_data.get(user_id) == data:
+            return
+        self.user_data[user_id] = dict(data)
+        self._schedule_write()
+
+    async def update_chat_data(self, chat_id: int, data: Dict):
+        pass
+
+    async def update_bot_data(self, data: Dict):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id: int):
+        pass
+
+    async def drop_user_data(self, user_id: int):
+        if self.user_data.pop(user_id, None) is not None:
+            self._schedule_write()
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict):
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict):
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict):
+        pass
+
+    async def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._write()
+
+class ChatUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates of different chats concurrently, at most max_active at
+    a time, while updates of the same chat run one by one in arrival order.
+
+    Updates waiting for their chat do not hold one of the max_active slots.
+    At most max_admitted updates sit in the per-chat queues, the rest wait
+    in the base class semaphore. This is not a memory cap: PTB still creates
+    one task per fetched update, pending counts all of them.
+    """
+
+    def __init__(self, max_active: int = MAX_CONCURRENT_UPDATES, max_admitted: int = MAX_ADMITTED_UPDATES):
+        super().__init__(max_concurrent_updates=max(max_active, max_admitted))
+        self.max_active = max_active
+        self._active = asyncio.Semaphore(max_active)
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_pending: Dict[int, int] = {}
+        self.pending = 0
+        self.max_pending = 0
+        self.processed = 0
+        self.max_chat_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.handler_times: Dict[str, List[float]] = {}  # label -> [count, total_s, max_s]
+
+    def _chat_lock(self, chat_id: Optional[int]):
+        if chat_id is None:
+            return contextlib.nullcontext()
+        return self._chat_locks.setdefault(chat_id, asyncio.Lock())
+
+    async def process_update(self, update: object, coroutine):
+        # Counted before the admission semaphore so waiting updates show up too
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        try:
+            await super().process_update(update, coroutine)
+        finally:
+            self.pending -= 1
+            self.processed += 1
+
+    async def do_process_update(self, update: object, coroutine):
+        chat = update.effective_chat if isinstance(update, Update) else None
+        chat_id = chat.id if chat else None
+        queued_at = time.monotonic()
+        
+        if chat_id is not None:
+            depth = self._chat_pending.get(chat_id, 0) + 1
+            self._chat_pending[chat_id] = depth
+            self.max_chat_depth = max(self.max_chat_depth, depth)
+        
+        try:
+            async with self._chat_lock(chat_id), self._active:
+                wait = time.monotonic() - queued_at
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+                started = time.perf_counter()
+                try:
+                    await coroutine
+                finally:
+                    self.record_handler_time(update_label(update), time.perf_counter() - started)
+        finally:
+            if chat_id is not None:
+                self._chat_pending[chat_id] -= 1
+                if not self._chat_pending[chat_id]:
+                    del self._chat_pending[chat_id]
+                    del self._chat_locks[chat_id]
+
+    def record_handler_time(self, label: str, elapsed: float):
+        times = self.handler_times.get(label)
+        if times is None:
+            times = self.handler_times[label] = [0, 0.0, 0.0]
+        times[0] += 1
+        times[1] += elapsed
+        times[2] = max(times[2], elapsed)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "queued_chats": len(self._chat_pending),
+            "max_chat_depth": self.max_chat_depth,
+            "processed": self.processed,
+            "avg_wait_ms": round(self.total_wait / self.processed * 1000, 2) if self.processed else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
+
+def update_label(update: object) -> str:
+    """Command name or update kind, used to split handler time"""
+    if not isinstance(update, Update):
+        return "other"
+    if update.message and update.message.text and update.message.text.startswith("/"):
+        return update.message.text.split()[0].split("@")[0]
+    if update.callback_query:
+        return "callback_query"
+    if update.inline_query:
+        return "inline_query"
+    return "message"
+
+class ConnectionCounter(logging.Handler):
+    """Counts new TCP connections reported by httpcore's debug trace"""
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.connects = 0
+
+    def emit(self, record: logging.LogRecord):
+        if record.getMessage().startswith("connect_tcp.complete"):
+            self.connects += 1
+
+connection_counter = ConnectionCounter()
+http_requests: List["InstrumentedHTTPXRequest"] = []
+
+class InstrumentedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest that records pool wait time and request counts.
+
+    Requests take one of connection_pool_size slots before reaching httpx, so
+    the time spent waiting for a slot is the connection pool wait time.
+    """
+
+    def __init__(self, name: str, connection_pool_size: int = 1, pool_timeout: float = 1.0, **kwargs):
+        super().__init__(connection_pool_size=connection_pool_size, pool_timeout=pool_timeout, **kwargs)
+        self.name = name
+        self.pool_size = connection_pool_size
+        self.pool_timeout = pool_timeout
+        self._slots = asyncio.Semaphore(connection_pool_size)
+        self.requests = 0
+        self.pool_waits = 0
+        self.pool_timeouts = 0
+        self.total_pool_wait = 0.0
+        self.max_pool_wait = 0.0
+        self.total_request_time = 0.0
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data=None,
+        read_timeout=BaseRequest.DEFAULT_NONE,
+        write_timeout=BaseRequest.DEFAULT_NONE,
+        connect_timeout=BaseRequest.DEFAULT_NONE,
+        pool_timeout=BaseRequest.DEFAULT_NONE,
+    ) -> Tuple[int, bytes]:
+        timeout = self.pool_timeout if pool_timeout is BaseRequest.DEFAULT_NONE else pool_timeout
+        queued_at = time.monotonic()
+        
+        if self._slots.locked():
+            self.pool_waits += 1
+        try:
+            async with asyncio.timeout(timeout):
+                await self._slots.acquire()
+        except asyncio.TimeoutError as exc:
+            self.pool_timeouts += 1
+            raise TimedOut(
+                "Pool timeout: All connections in the connection pool are occupied. "
+                "Request was *not* sent to Telegram. Consider adjusting the connection "
+                "pool size or the pool timeout."
+            ) from exc
+        
+        started = time.monotonic()
+        wait = started - queued_at
+        self.total_pool_wait += wait
+        self.max_pool_wait = max(self.max_pool_wait, wait)
+        try:
+            return await super().do_request(
+                url,
+                method,
+                request_data=request_data,
+                read_timeout=read_timeout,
+                write_timeout=write_timeout,
+                connect_timeout=connect_timeout,
+                pool_timeout=pool_timeout,
+            )
+        finally:
+            self.requests += 1
+            self.total_request_time += time.monotonic() - started
+            self._slots.release()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "pool_size": self.pool_size,
+            "requests": self.requests,
+            "pool_waits": self.pool_waits,
+            "pool_timeouts": self.pool_timeouts,
+            "avg_pool_wait_ms": round(self.total_pool_wait / self.requests * 1000, 2) if self.requests else 0.0,
+            "max_pool_wait_ms": round(self.max_pool_wait * 1000, 2),
+            "avg_request_ms": round(self.total_request_time / self.requests * 1000, 2) if self.requests else 0.0,
+        }
+
+def get_http_version() -> str:
+    if USE_HTTP2 and importlib.util.find_spec("h2") is None:
+        logger.warning("USE_HTTP2 is set but the h2 package is not installed, using HTTP/1.1")
+        return "1.1"
+    return "2" if USE_HTTP2 else "1.1"
+
+def build_requests() -> Tuple[InstrumentedHTTPXRequest, InstrumentedHTTPXRequest]:
+    """Separate connection pools for outgoing API calls and for getUpdates"""
+    http_version = get_http_version()
+    send_request = InstrumentedHTTPXRequest(
+        "send",
+        connection_pool_size=SEND_POOL_SIZE,
+        pool_timeout=SEND_POOL_TIMEOUT,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        write_timeout=WRITE_TIMEOUT,
+        http_version=http_version,
+    )
+    # getUpdates runs one long poll at a time, a single connection is enough
+    polling_request = InstrumentedHTTPXRequest(
+        "polling",
+        connection_pool_size=1,
+        pool_timeout=SEND_POOL_TIMEOUT,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUT,
+        write_timeout=WRITE_TIMEOUT,
+        http_version=http_version,
+    )
+    
+    httpcore_logger = logging.getLogger("httpcore.connection")
+    httpcore_logger.setLevel(logging.DEBUG)
+    httpcore_logger.propagate = False
+    httpcore_logger.addHandler(connection_counter)
+    http_requests[:] = [send_request, polling_request]
+    return send_request, polling_request
+
+def request_metrics() -> Dict[str, Any]:
+    metrics = {request.name: request.metrics() for request in http_requests}
+    total_requests = sum(request.requests for request in http_requests)
+    metrics["new_connections"] = connection_counter.connects
+    metrics["connection_reuse"] = (
+        round(1 - connection_counter.connects / total_requests, 3) if total_requests else 0.0
+    )
+    return metrics
 
 def get_chat_id(update: Update) -> int:
     return update.effective_chat.id
 
+def get_chat_lock(chat_id: int) -> asyncio.Lock:
+    """Per-chat lock serializing load -> mutate -> save of that chat's data"""
+    lock = chat_locks.get(chat_id)
+    if lock is None:
+        lock = chat_locks[chat_id] = asyncio.Lock()
+    return lock
+
+class TokenBucket:
+    """Holds up to capacity tokens, refilled continuously at rate tokens per second"""
+    
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+    
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+    
+    def refill(self, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+    
+    def wait_time(self, cost: float) -> float:
+        return max(0.0, (cost - self.tokens) / self.rate)
+
+def get_bucket(kind: str, key: int, now: float) -> TokenBucket:
+    bucket = rate_buckets.get((kind, key))
+    if bucket is None:
+        if len(rate_buckets) > 4096:
+            prune_rate_limits(now)
+        rate, capacity = (USER_RATE, USER_BURST) if kind == "user" else (CHAT_RATE, CHAT_BURST)
+        bucket = rate_buckets[(kind, key)] = TokenBucket(rate, capacity, now)
+    bucket.refill(now)
+    return bucket
+
+def prune_rate_limits(now: float):
+    """Forget full buckets and expired coalescing/notice entries, they carry no state"""
+    for key in [key for key, bucket in rate_buckets.items() if bucket.refill(now) >= bucket.capacity]:
+        del rate_buckets[key]
+    for key in [key for key, at in recent_commands.items() if now - at >= COALESCE_WINDOW]:
+        del recent_commands[key]
+    for key in [key for key, until in throttle_notices.items() if until <= now]:
+        del throttle_notices[key]
+
+def rate_limited(command: str, handler):
+    """Wrap a read-only command handler with per-user and per-chat token buckets.
+
+    Identical requests in a chat within COALESCE_WINDOW are answered once,
+    unless the chat's data changed in between (see invalidate_rendered). A
+    throttled user gets one notice, further attempts until the bucket refills
+    are dropped silently.
+    """
+    cost = COMMAND_COSTS.get(command, 1)
+    
+    @functools.wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        now = time.monotonic()
+        chat_id = get_chat_id(update)
+        user_id = update.effective_user.id if update.effective_user else chat_id
+        
+        request_key = (chat_id, command, tuple(arg.lower() for arg in context.args or ()))
+        if len(recent_commands) > 1024:
+            prune_rate_limits(now)
+        last = recent_commands.get(request_key)
+        if last is not None and now - last < COALESCE_WINDOW:
+            rate_limit_metrics["coalesced"] += 1
+            return
+        
+        buckets = (get_bucket("user", user_id, now), get_bucket("chat", chat_id, now))
+        if any(bucket.tokens < cost for bucket in buckets):
+            rate_limit_by_command[command] = rate_limit_by_command.get(command, 0) + 1
+            if throttle_notices.get((chat_id, user_id), 0.0) > now:
+                rate_limit_metrics["dropped"] += 1
+                return
+            
+            wait = max(bucket.wait_time(cost) for bucket in buckets)
+            throttle_notices[(chat_id, user_id)] = now + wait
+            rate_limit_metrics["throttled"] += 1
+            await update.message.reply_text(f"⏳ Slow down, try again in {int(wait) + 1}s", parse_mode='MarkdownV2')
+            return
+        
+        for bucket in buckets:
+            bucket.tokens -= cost
+        recent_commands[request_key] = now
+        rate_limit_metrics["allowed"] += 1
+        await handler(update, context)
+    
+    return wrapper
+
 def acquire_lock():
     global lock_file
     try:
@@ -189,9 +1194,38 @@ async def verify_bot_token(token: str) -> bool:
         logger.error(f"✗ Bot token verification failed: {e}")
         return False
 
+@functools.lru_cache(maxsize=None)
+def get_zone(name: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"Unknown timezone {name!r}, using {DEFAULT_TIMEZONE}")
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+def get_chat_tz(chat_id: Optional[int] = None) -> ZoneInfo:
+    """The chat's configured timezone, resolved once and cached"""
+    if chat_id is None:
+        return get_zone(DEFAULT_TIMEZONE)
+    zone = chat_zones.get(chat_id)
+    if zone is None:
+        zone = get_zone(load_group_config(chat_id).get("timezone") or DEFAULT_TIMEZONE)
+        chat_zones[chat_id] = zone
+    return zone
+
+def chat_now(chat_id: Optional[int] = None) -> datetime.datetime:
+    return datetime.datetime.now(get_chat_tz(chat_id))
+
+def chat_today(chat_id: Optional[int] = None) -> datetime.date:
+    return chat_now(chat_id).date()
+
+@functools.lru_cache(maxsize=4096)
+def day_start(zone: ZoneInfo, date: datetime.date) -> datetime.datetime:
+    """Midnight at the start of date in zone, computed once per (zone, day)"""
+    return datetime.datetime.combine(date, datetime.time.min, tzinfo=zone)
+
 def get_week_type(date: datetime.date = None) -> str:
     if date is None:
-        date = datetime.date.today()
+        date = chat_today()
     week_num = date.isocalendar()[1]
     return "ч/н" if week_num % 2 == 0 else "н/ч"
 
@@ -201,47 +1235,134 @@ def is_lesson_this_week(lesson: Dict, date: datetime.date = None) -> bool:
     week_type = get_week_type(date)
     return lesson["week"] == week_type
 
-def parse_flexible_date(date_str: str) -> datetime.date | str:
-    today = datetime.date.today()
-    date_lower = date_str.lower().strip()
-    
-    if date_lower in ["none", "tbd", "n/a", "undefined", "-"]:
-        return "TBD"
-    
-    if date_lower in ["today", "սյօր", "сегодня"]:
-        return today
-    elif date_lower in ["tomorrow", "վաղը", "завтра"]:
-        return today + datetime.timedelta(days=1)
-    elif date_lower in ["next week", "հաջորդ շաբաթ", "на след неделе"]:
-        return today + datetime.timedelta(days=7)
-    elif re.match(r'^\+\d+$', date_lower):
-        days = int(date_lower[1:])
-        return today + datetime.timedelta(days=days)
-    else:
-        match_dd_mm = re.match(r'^(\d{1,2})[-/](\d{1,2})$', date_lower)
-        if match_dd_mm:
-            day, month = map(int, match_dd_mm.groups())
-            target_date = datetime.date(today.year, month, day)
-            if target_date < today:
-                target_date = datetime.date(today.year + 1, month, day)
-            return target_date
-        return datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-
-def format_deadline_status(due_date_str: str) -> Tuple[str, int, datetime.datetime]:
+DATE_KEYWORDS: Dict[str, Any] = {
+    **dict.fromkeys(["none", "tbd", "n/a", "undefined", "-"], "TBD"),
+    **dict.fromkeys(["today", "сегодня", "այսօր", "սյօր"], 0),
+    **dict.fromkeys(["tomorrow", "завтра", "վաղը"], 1),
+    **dict.fromkeys(["day after tomorrow", "послезавтра", "վաղը չէ մյուս օրը"], 2),
+    **dict.fromkeys(["next week", "на след неделе", "на следующей неделе", "через неделю", "հաջորդ շաբաթ"], 7),
+}
+
+WEEKDAYS: Dict[str, int] = {
+    **dict.fromkeys(["monday", "mon", "понедельник", "пн", "երկուշաբթի", "երկ"], 0),
+    **dict.fromkeys(["tuesday", "tue", "tues", "вторник", "вт", "երեքշաբթի", "երք"], 1),
+    **dict.fromkeys(["wednesday", "wed", "среда", "среду", "ср", "չորեքշաբթի", "չրք"], 2),
+    **dict.fromkeys(["thursday", "thu", "thur", "thurs", "четверг", "чт", "հինգշաբթի", "հնգ"], 3),
+    **dict.fromkeys(["friday", "fri", "пятница", "пятницу", "пт", "ուրբաթ", "ուրբ"], 4),
+    **dict.fromkeys(["saturday", "sat", "суббота", "субботу", "сб", "շաբաթ", "շբթ"], 5),
+    **dict.fromkeys(["sunday", "sun", "воскресенье", "вс", "կիրակի", "կիր"], 6),
+}
+
+# Filler words around "next <subject> lesson" in all three languages
+LESSON_WORDS = frozenset([
+    "lesson", "class", "of", "in", "on",
+    "пара", "пары", "паре", "пару", "урок", "урока", "уроку", "занятие", "занятия", "по",
+    "դաս", "դասը", "դասին",
+])
+
+RELATIVE_DAYS_RE = re.compile(r"^\+(\d+)$")
+DAY_MONTH_RE = re.compile(r"^(\d{1,2})[-/.](\d{1,2})$")
+ISO_DATE_RE = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})$")
+WEEKDAY_RE = re.compile(r"^(?:on |в |во )?(\w+)$")
+NEXT_RE = re.compile(r"^(?:(?:к|на|до|by) )?(?:next|след\w*\.?|հաջորդ) (.+)$")
+
+def next_weekday(today: datetime.date, weekday: int) -> datetime.date:
+    """The next such weekday after today (a week ahead if today is that day)"""
+    return today + datetime.timedelta(days=(weekday - today.weekday()) % 7 or 7)
+
+def next_lesson_date(chat_id: int, subject_text: str, today: datetime.date) -> Optional[datetime.date]:
+    """Date of the chat's next lesson of a subject within the two-week timetable cycle"""
+    registry = get_subject_registry(chat_id)
+    subject = registry.resolve(subject_text)
+    if subject is None:
+        return None
+    
+    schedule = load_group_timetable(chat_id)
+    for offset in range(1, 15):
+        day = today + datetime.timedelta(days=offset)
+        for lesson in schedule.get(day.strftime('%A'), []):
+            lesson_subject = registry.aliases.get(normalize_subject(lesson.get("subject", "")))
+            if lesson_subject == subject and is_lesson_this_week(lesson, day):
+                return day
+    return None
+
+def parse_flexible_date(
+    date_str: str, today: datetime.date = None, chat_id: Optional[int] = None
+) -> datetime.date | str:
+    """Due date from user input, or "TBD". Raises ValueError if not understood.
+
+    chat_id enables "next <subject> lesson" lookups in that chat's timetable.
+    """
+    if today is None:
+        today = chat_today(chat_id)
+    return parse_date_text(" ".join(date_str.casefold().split()), today, chat_id)
+
+@functools.lru_cache(maxsize=1024)
+def parse_date_text(text: str, today: datetime.date, chat_id: Optional[int]) -> datetime.date | str:
+    keyword = DATE_KEYWORDS.get(text)
+    if keyword is not None:
+        return keyword if keyword == "TBD" else today + datetime.timedelta(days=keyword)
+    
+    match = RELATIVE_DAYS_RE.match(text)
+    if match:
+        try:
+            return today + datetime.timedelta(days=int(match.group(1)))
+        except OverflowError:
+            raise ValueError(f"Date out of range: {text}")
+    
+    match = DAY_MONTH_RE.match(text)
+    if match:
+        day, month = map(int, match.groups())
+        # Next occurrence on or after today; 29-02 may be up to four years away
+        for year in range(today.year, today.year + 5):
+            try:
+                target_date = datetime.date(year, month, day)
+            except ValueError:
+                if not 1 <= month <= 12 or not 1 <= day <= 31:
+                    raise
+                continue
+            if target_date >= today:
+                return target_date
+        raise ValueError(f"Invalid date: {text}")
+    
+    match = ISO_DATE_RE.match(text)
+    if match:
+        return datetime.date(*map(int, match.groups()))
+    
+    match = WEEKDAY_RE.match(text)
+    if match and match.group(1) in WEEKDAYS:
+        return next_weekday(today, WEEKDAYS[match.group(1)])
+    
+    match = NEXT_RE.match(text)
+    if match:
+        words = [word for word in match.group(1).split() if word not in LESSON_WORDS]
+        if len(words) == 1 and words[0] in WEEKDAYS:
+            return next_weekday(today, WEEKDAYS[words[0]])
+        if words and chat_id is not None:
+            lesson_date = next_lesson_date(chat_id, " ".join(words), today)
+            if lesson_date is not None:
+                return lesson_date
+    
+    raise ValueError(f"Unrecognized date: {text}")
+
+def format_deadline_status(
+    due_date_str: str, chat_id: Optional[int] = None, now: datetime.datetime = None
+) -> Tuple[str, int, datetime.datetime]:
     """
     Returns (status_emoji_text, priority, deadline_datetime)
-    Deadline is at 00:00 (midnight at start of the due date)
+    Deadline is at 00:00 (midnight at start of the due date) in the chat's timezone
     Priority: lower number = higher urgency
+    Pass now (aware, in the chat's timezone) when formatting a batch of tasks
     """
     if due_date_str == "TBD":
         return ("TBD", 999, datetime.datetime.max)
     
     try:
-        due_date = datetime.datetime.strptime(due_date_str, "%Y-%m-%d").date()
-        deadline_dt = datetime.datetime.combine(due_date, datetime.time.min)
-        deadline_dt = ARMENIA_TZ.localize(deadline_dt)
+        zone = get_chat_tz(chat_id) if now is None else now.tzinfo
+        if now is None:
+            now = datetime.datetime.now(zone)
+        deadline_dt = day_start(zone, datetime.date.fromisoformat(due_date_str))
         
-        now = datetime.datetime.now(ARMENIA_TZ)
         time_left = deadline_dt - now
         
         hours_left = time_left.total_seconds() / 3600
@@ -278,13 +1399,18 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "`/hw_list` \\- all homework\n"
         "`/hw_remove <subj> <id>`\n"
         "`/hw_today`, `/hw_overdue`\n"
+        "`/hw_search <query>`\n"
+        "`/hw_alias Alias \\| Subject`\n"
         "`/hw_stats`, `/hw_clean`\n\n"
         "*Schedule*\n"
         "`/timetable` \\- today\n"
         "`/full_timetable` \\- week\n"
         "`/set_timetable` \\- edit\n"
-        "`/next` \\- next lesson\n\n"
-        "_Date: tomorrow, \\+3, 15\\-12, TBD_\n"
+        "`/dashboard on\\|off` \\- pinned overview\n"
+        "`/next` \\- next lesson\n"
+        "`/calendar` \\- \\.ics for your calendar app\n"
+        "`@bot hw\\|today\\|next` \\- inline lookup\n\n"
+        "_Date: tomorrow, \\+3, 15\\-12, friday, next Python, TBD_\n"
         "_Deadlines are at 00:00 on the due date_"
     )
     await update.message.reply_text(msg, parse_mode='MarkdownV2')
@@ -313,7 +1439,7 @@ async def hw_quick_add(update: Update, context: ContextTypes.DEFAULT_TYPE):
     subject, task, date_str = parts[0], parts[1], parts[2]
     
     try:
-        due_date_or_tbd = parse_flexible_date(date_str)
+        due_date_or_tbd = parse_flexible_date(date_str, chat_today(chat_id), chat_id)
     except ValueError:
         await update.message.reply_text("Invalid date format", parse_mode='MarkdownV2')
         return
@@ -323,17 +1449,14 @@ async def hw_quick_add(update: Update, context: ContextTypes.DEFAULT_TYPE):
         status_text = "TBD"
     else:
         due_iso = due_date_or_tbd.isoformat()
-        status_text, _, _ = format_deadline_status(due_iso)
+        status_text, _, _ = format_deadline_status(due_iso, chat_id)
     
-    hw = load_homework(chat_id)
-    hw_item = {
-        "task": task,
-        "due": due_iso,
-        "added": datetime.date.today().isoformat()
-    }
+    hw_item = make_task_item(task, due_iso, chat_today(chat_id).isoformat())
     
-    hw.setdefault(subject, []).append(hw_item)
-    save_homework(chat_id, hw)
+    async with get_chat_lock(chat_id):
+        hw = load_homework(chat_id)
+        subject = get_subject_registry(chat_id, hw).canonical(subject)
+        mutate_homework(chat_id, hw, {"op": "add", "subject": subject, "item": hw_item})
     
     task_preview = task[:80] if len(task) <= 80 else task[:80] + "..."
     
@@ -390,7 +1513,7 @@ async def get_date_and_save_long(update: Update, context: ContextTypes.DEFAULT_T
     chat_id = get_chat_id(update)
 
     try:
-        due_date_or_tbd = parse_flexible_date(date_str)
+        due_date_or_tbd = parse_flexible_date(date_str, chat_today(chat_id), chat_id)
     except ValueError:
         await update.message.reply_text(
             "Invalid date\\. Try again or /cancel",
@@ -403,17 +1526,14 @@ async def get_date_and_save_long(update: Update, context: ContextTypes.DEFAULT_T
         status_text = "TBD"
     else:
         due_iso = due_date_or_tbd.isoformat()
-        status_text, _, _ = format_deadline_status(due_iso)
+        status_text, _, _ = format_deadline_status(due_iso, chat_id)
 
-    hw = load_homework(chat_id)
-    hw_item = {
-        "task": task,
-        "due": due_iso,
-        "added": datetime.date.today().isoformat()
-    }
+    hw_item = make_task_item(task, due_iso, chat_today(chat_id).isoformat())
     
-    hw.setdefault(subject, []).append(hw_item)
-    save_homework(chat_id, hw)
+    async with get_chat_lock(chat_id):
+        hw = load_homework(chat_id)
+        subject = get_subject_registry(chat_id, hw).canonical(subject)
+        mutate_homework(chat_id, hw, {"op": "add", "subject": subject, "item": hw_item})
     
     task_preview = task[:60] if len(task) <= 60 else task[:60] + "..."
     await update.message.reply_text(
@@ -426,6 +1546,33 @@ async def get_date_and_save_long(update: Update, context: ContextTypes.DEFAULT_T
     context.user_data.clear()
     return ConversationHandler.END
 
+async def hw_alias(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = get_chat_id(update)
+    
+    full_text = " ".join(context.args or []).replace('\\|', '|')
+    parts = [p.strip() for p in full_text.split('|')]
+    if len(parts) < 2 or not parts[0] or not parts[1]:
+        await update.message.reply_text(
+            "Usage: `/hw_alias Alias \\| Subject`\n"
+            "Example: `/hw_alias Пайтон \\| Python`",
+            parse_mode='MarkdownV2'
+        )
+        return
+    
+    alias, subject_input = parts[0], parts[1]
+    async with get_chat_lock(chat_id):
+        subject = get_subject_registry(chat_id).resolve(subject_input) or subject_input
+        config = load_group_config(chat_id)
+        config.setdefault("subject_aliases", {})[alias] = subject
+        save_group_config(chat_id, config)
+        subject_registries.pop(chat_id, None)
+        parse_date_text.cache_clear()
+    
+    await update.message.reply_text(
+        f"✓ {escape_markdown_v2(alias)} → *{escape_markdown_v2(subject)}*",
+        parse_mode='MarkdownV2'
+    )
+
 async def hw_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = get_chat_id(update)
     hw = load_homework(chat_id)
@@ -437,7 +1584,7 @@ async def hw_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     total = sum(len(tasks) for tasks in hw.values())
     overdue = due_today = due_tomorrow = tbd_count = 0
     
-    now = datetime.datetime.now(ARMENIA_TZ)
+    now = chat_now(chat_id)
     
     for tasks in hw.values():
         for task in tasks:
@@ -445,7 +1592,7 @@ async def hw_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 tbd_count += 1
                 continue
             
-            status_text, priority, _ = format_deadline_status(task["due"])
+            status_text, priority, _ = format_deadline_status(task["due"], chat_id, now)
             if priority == 0:
                 overdue += 1
             elif priority == 1:
@@ -466,61 +1613,44 @@ async def hw_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def hw_clean(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = get_chat_id(update)
-    hw = load_homework(chat_id)
     
-    if not hw:
+    cleaned = None
+    async with get_chat_lock(chat_id):
+        hw = load_homework(chat_id)
+        
+        if hw:
+            cutoff = chat_today(chat_id) - datetime.timedelta(days=30)
+            cleaned = mutate_homework(chat_id, hw, {"op": "clean", "cutoff": cutoff.isoformat()})
+    
+    if cleaned is None:
         await update.message.reply_text("No homework", parse_mode='MarkdownV2')
         return
     
-    cutoff = datetime.date.today() - datetime.timedelta(days=30)
-    cleaned = 0
-    
-    for subject in list(hw.keys()):
-        keep = []
-        for task in hw[subject]:
-            if task["due"] == "TBD":
-                keep.append(task)
-                continue
-
-            try:
-                due = datetime.datetime.strptime(task["due"], "%Y-%m-%d").date()
-                if due >= cutoff:
-                    keep.append(task)
-                else:
-                    cleaned += 1
-            except ValueError:
-                keep.append(task)
-        
-        if keep:
-            hw[subject] = keep
-        else:
-            del hw[subject]
-    
-    save_homework(chat_id, hw)
     msg = f"✓ Cleaned {cleaned} old items" if cleaned > 0 else "Nothing to clean"
     await update.message.reply_text(msg, parse_mode='MarkdownV2')
 
 async def hw_today(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = get_chat_id(update)
-    hw = load_homework(chat_id)
-    
+    await update.message.reply_text(render_due_today(chat_id, load_homework(chat_id)), parse_mode='MarkdownV2')
+
+def render_due_today(chat_id: int, hw: Dict) -> str:
     today_hw = []
+    now = chat_now(chat_id)
     for subj, tasks in hw.items():
         for task in tasks:
-            status_text, priority, _ = format_deadline_status(task["due"])
+            status_text, priority, _ = format_deadline_status(task["due"], chat_id, now)
             if priority == 1:
                 today_hw.append((subj, task, status_text))
     
     if not today_hw:
-        await update.message.reply_text("Nothing due today", parse_mode='MarkdownV2')
-        return
+        return "Nothing due today"
     
     msg = "*Due Today*\n\n"
     for subj, task, status in today_hw:
-        preview = task['task'][:60] if len(task['task']) <= 60 else task['task'][:60] + "..."
+        preview = task_preview(task, 60)
         msg += f"*{escape_markdown_v2(subj)}* {escape_markdown_v2(status)}\n{escape_markdown_v2(preview)}\n\n"
     
-    await update.message.reply_text(msg, parse_mode='MarkdownV2')
+    return msg
 
 async def hw_overdue(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = get_chat_id(update)
@@ -531,10 +1661,11 @@ async def hw_overdue(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     overdue = []
+    now = chat_now(chat_id)
     
     for subj, tasks in hw.items():
         for task in tasks:
-            status_text, priority, deadline_dt = format_deadline_status(task["due"])
+            status_text, priority, deadline_dt = format_deadline_status(task["due"], chat_id, now)
             if priority == 0:
                 overdue.append((subj, task, status_text, deadline_dt))
     
@@ -546,7 +1677,7 @@ async def hw_overdue(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = f"*Overdue \\({len(overdue)}\\)*\n\n"
     
     for subj, task, status, _ in overdue[:10]:
-        preview = task['task'][:50] if len(task['task']) <= 50 else task['task'][:50] + "..."
+        preview = task_preview(task, 50)
         msg += f"*{escape_markdown_v2(subj)}* {escape_markdown_v2(status)}\n{escape_markdown_v2(preview)}\n\n"
     
     if len(overdue) > 10:
@@ -562,24 +1693,134 @@ async def hw_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("No homework", parse_mode='MarkdownV2')
         return
     
+    await update.message.reply_text(render_homework_list(chat_id, hw), parse_mode='MarkdownV2')
+
+def message_length(text: str) -> int:
+    """Length as Telegram counts it, in UTF-16 code units"""
+    return len(text.encode("utf-16-le")) // 2
+
+def render_homework_list(chat_id: int, hw: Dict, limit: int = MAX_MESSAGE_LENGTH) -> str:
+    """Tasks by subject, cut off with an "... N more" line before the text exceeds limit"""
     msg = "*Homework*\n\n"
+    length = message_length(msg)
+    hidden = 0
+    now = chat_now(chat_id)
     
-    for idx, subj in enumerate(sorted(hw.keys()), 1):
-        msg += f"*{idx}\\. {escape_markdown_v2(subj)}*\n"
+    for idx, subj in enumerate(get_sorted_subjects(chat_id, hw), 1):
+        header = f"*{idx}\\. {escape_markdown_v2(subj)}*\n"
         
         tasks_info = []
         for i, task in enumerate(hw[subj], 1):
-            status_text, priority, deadline_dt = format_deadline_status(task["due"])
+            status_text, priority, deadline_dt = format_deadline_status(task["due"], chat_id, now)
             tasks_info.append((i, task, status_text, priority, deadline_dt))
         
         tasks_info.sort(key=lambda x: (x[3], x[4]))
         
         for i, task, status, _, _ in tasks_info:
-            preview = task['task'][:70] if len(task['task']) <= 70 else task['task'][:70] + "..."
-            msg += f"   `{i}` {escape_markdown_v2(preview)} {escape_markdown_v2(status)}\n"
-        msg += "\n"
+            preview = task_preview(task, 70)
+            line = f"   `{i}` {escape_markdown_v2(preview)} {escape_markdown_v2(status)}\n"
+            if header:
+                line = header + line
+            # Keep room for the blank line after the subject and the "... N more" line
+            if hidden or length + message_length(line) + 40 > limit:
+                hidden += 1
+                continue
+            msg += line
+            length += message_length(line)
+            header = ""
+        if not header:
+            msg += "\n"
+            length += 1
     
-    await update.message.reply_text(msg, parse_mode='MarkdownV2')
+    if hidden:
+        msg += f"_\\.\\.\\. {hidden} more_"
+    return msg
+
+def render_dashboard(chat_id: int) -> str:
+    hw = load_homework(chat_id)
+    return render_homework_list(chat_id, hw) if hw else "*Homework*\n\nNo homework"
+
+def schedule_dashboard_update(chat_id: int):
+    """Coalesce homework changes within DASHBOARD_DEBOUNCE seconds into one edit"""
+    # Only cached state here, this runs on every homework write
+    if chat_id in dashboard_timers or chat_id not in get_dashboard_chats():
+        return
+    dashboard_timers[chat_id] = asyncio.create_task(delayed_dashboard_refresh(chat_id))
+
+async def delayed_dashboard_refresh(chat_id: int):
+    await asyncio.sleep(DASHBOARD_DEBOUNCE)
+    # Changes made while editing start a new debounce window
+    dashboard_timers.pop(chat_id, None)
+    await refresh_dashboard(chat_id)
+
+async def refresh_dashboard(chat_id: int):
+    """Edit the pinned dashboard in place, skipped when the rendered text is unchanged"""
+    dashboard = load_group_config(chat_id).get("dashboard")
+    if not dashboard or not app:
+        return
+    
+    text = render_dashboard(chat_id)
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    if dashboard_hashes.get(chat_id) == digest:
+        return
+    
+    try:
+        await app.bot.edit_message_text(
+            text, chat_id=chat_id, message_id=dashboard["message_id"], parse_mode='MarkdownV2'
+        )
+    except BadRequest as e:
+        # Still counts as up to date, e.g. right after a restart
+        if "not modified" not in str(e).lower():
+            logger.error(f"Failed to edit dashboard in {chat_id}: {e}")
+            return
+    except Exception as e:
+        logger.error(f"Failed to edit dashboard in {chat_id}: {e}")
+        return
+    dashboard_hashes[chat_id] = digest
+
+async def flush_dashboards():
+    """Apply pending dashboard edits now instead of after their debounce window"""
+    for chat_id, task in list(dashboard_timers.items()):
+        task.cancel()
+        dashboard_timers.pop(chat_id, None)
+        await refresh_dashboard(chat_id)
+
+async def dashboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = get_chat_id(update)
+    mode = context.args[0].lower() if context.args else ""
+    
+    if mode not in ("on", "off"):
+        await update.message.reply_text(
+            "Usage: `/dashboard on\\|off`\n"
+            "Keeps one pinned homework overview that is edited in place",
+            parse_mode='MarkdownV2'
+        )
+        return
+    
+    config = load_group_config(chat_id)
+    old = config.pop("dashboard", None)
+    if old:
+        try:
+            await context.bot.unpin_chat_message(chat_id, message_id=old["message_id"])
+        except Exception as e:
+            logger.warning(f"Could not unpin old dashboard in {chat_id}: {e}")
+    
+    if mode == "off":
+        save_group_config(chat_id, config)
+        dashboard_hashes.pop(chat_id, None)
+        await update.message.reply_text("✓ Dashboard off", parse_mode='MarkdownV2')
+        return
+    
+    text = render_dashboard(chat_id)
+    message = await update.message.reply_text(text, parse_mode='MarkdownV2')
+    try:
+        await context.bot.pin_chat_message(chat_id, message.message_id, disable_notification=True)
+    except Exception as e:
+        logger.warning(f"Could not pin dashboard in {chat_id}: {e}")
+    
+    config["dashboard"] = {"message_id": message.message_id}
+    save_group_config(chat_id, config)
+    dashboard_hashes[chat_id] = hashlib.sha1(text.encode("utf-8")).hexdigest()
 
 async def hw_remove(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = get_chat_id(update)
@@ -599,40 +1840,56 @@ async def hw_remove(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Invalid index", parse_mode='MarkdownV2')
         return
 
-    hw = load_homework(chat_id)
-    if not hw:
-        await update.message.reply_text("No homework", parse_mode='MarkdownV2')
+    async with get_chat_lock(chat_id):
+        hw = load_homework(chat_id)
+        if not hw:
+            error = "No homework"
+        else:
+            subject = None
+            try:
+                subj_idx = int(subj_input) - 1
+                sorted_subj = get_sorted_subjects(chat_id, hw)
+                if 0 <= subj_idx < len(sorted_subj):
+                    subject = sorted_subj[subj_idx]
+            except ValueError:
+                subject = subj_input if subj_input in hw else get_subject_registry(chat_id, hw).resolve(subj_input)
+            
+            if not subject or subject not in hw:
+                error = "Subject not found"
+            elif hw_idx < 0 or hw_idx >= len(hw[subject]):
+                error = "Invalid index"
+            else:
+                error = None
+                removed = mutate_homework(chat_id, hw, {"op": "remove", "subject": subject, "index": hw_idx})
+    
+    if error:
+        await update.message.reply_text(error, parse_mode='MarkdownV2')
         return
+    
+    preview = task_preview(removed, 60)
+    await update.message.reply_text(
+        f"✓ Removed\n{escape_markdown_v2(preview)}", 
+        parse_mode='MarkdownV2'
+    )
 
-    subject = None
-    try:
-        subj_idx = int(subj_input) - 1
-        sorted_subj = sorted(hw.keys())
-        if 0 <= subj_idx < len(sorted_subj):
-            subject = sorted_subj[subj_idx]
-    except ValueError:
-        if subj_input in hw:
-            subject = subj_input
+async def hw_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = get_chat_id(update)
     
-    if not subject or subject not in hw:
-        await update.message.reply_text("Subject not found", parse_mode='MarkdownV2')
+    if not context.args:
+        await update.message.reply_text("Usage: `/hw_search <query>`", parse_mode='MarkdownV2')
         return
     
-    if hw_idx < 0 or hw_idx >= len(hw[subject]):
-        await update.message.reply_text("Invalid index", parse_mode='MarkdownV2')
+    results = get_search_index(chat_id).search(" ".join(context.args))
+    if not results:
+        await update.message.reply_text("No matches", parse_mode='MarkdownV2')
         return
-
-    removed = hw[subject].pop(hw_idx)
-    if not hw[subject]:
-        del hw[subject]
     
-    save_homework(chat_id, hw)
+    msg = f"*Search \\({len(results)}\\)*\n\n"
+    for subj_id, task_id, subj, task in results:
+        preview = task_preview(task, 60)
+        msg += f"`{subj_id} {task_id}` *{escape_markdown_v2(subj)}*\n{escape_markdown_v2(preview)}\n\n"
     
-    preview = removed['task'][:60] if len(removed['task']) <= 60 else removed['task'][:60] + "..."
-    await update.message.reply_text(
-        f"✓ Removed\n{escape_markdown_v2(preview)}", 
-        parse_mode='MarkdownV2'
-    )
+    await update.message.reply_text(msg, parse_mode='MarkdownV2')
 
 async def timetable(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = get_chat_id(update)
@@ -645,15 +1902,13 @@ async def timetable(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    today = datetime.date.today()
+    await update.message.reply_text(render_day_timetable(schedule, chat_today(chat_id)), parse_mode='MarkdownV2')
+
+def render_day_timetable(schedule: Dict[str, List[Dict[str, str]]], today: datetime.date) -> str:
     day_name = today.strftime('%A')
     
     if day_name not in schedule or not schedule[day_name]:
-        await update.message.reply_text(
-            f"*{escape_markdown_v2(day_name)}*\nNo lessons", 
-            parse_mode='MarkdownV2'
-        )
-        return
+        return f"*{escape_markdown_v2(day_name)}*\nNo lessons"
     
     week_type = get_week_type(today)
     msg = f"*{escape_markdown_v2(day_name)}* \\({week_type}\\)\n\n"
@@ -680,13 +1935,9 @@ async def timetable(update: Update, context: ContextTypes.DEFAULT_TYPE):
         msg += "\n"
     
     if displayed == 0:
-        await update.message.reply_text(
-            f"*{escape_markdown_v2(day_name)}*\nNo lessons this week", 
-            parse_mode='MarkdownV2'
-        )
-        return
+        return f"*{escape_markdown_v2(day_name)}*\nNo lessons this week"
     
-    await update.message.reply_text(msg, parse_mode='MarkdownV2')
+    return msg
 
 async def full_timetable(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = get_chat_id(update)
@@ -699,7 +1950,7 @@ async def full_timetable(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    today = datetime.date.today()
+    today = chat_today(chat_id)
     week_type = get_week_type(today)
     msg = f"*Weekly Schedule* \\({week_type}\\)\n\n"
     
@@ -781,7 +2032,8 @@ async def receive_timetable_json(update: Update, context: ContextTypes.DEFAULT_T
             await update.message.reply_text("Invalid format", parse_mode='MarkdownV2')
             return SETTING_TIMETABLE
         
-        save_group_timetable(chat_id, new_schedule)
+        async with get_chat_lock(chat_id):
+            save_group_timetable(chat_id, new_schedule)
         await update.message.reply_text("✓ Timetable updated", parse_mode='MarkdownV2')
         return ConversationHandler.END
         
@@ -803,8 +2055,9 @@ async def next_lesson(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("No timetable", parse_mode='MarkdownV2')
         return
     
-    now = datetime.datetime.now(ARMENIA_TZ)
-    today = now.date()
+    await update.message.reply_text(render_next_lesson(schedule, chat_today(chat_id)), parse_mode='MarkdownV2')
+
+def render_next_lesson(schedule: Dict[str, List[Dict[str, str]]], today: datetime.date) -> str:
     day_name = today.strftime('%A')
     
     days_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
@@ -839,10 +2092,301 @@ async def next_lesson(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     else:
                         msg += f"\n{escape_markdown_v2(check_day)}"
                     
-                    await update.message.reply_text(msg, parse_mode='MarkdownV2')
-                    return
+                    return msg
+    
+    return "No upcoming lessons"
+
+INLINE_QUERIES = {
+    "hw": ("Homework", "All open homework"),
+    "today": ("Today", "Today's timetable"),
+    "next": ("Next lesson", "Where and what is next"),
+}
+
+def get_inline_answer(chat_id: int, kind: str) -> str:
+    """Rendered inline answer, reused until it expires or the chat's data changes"""
+    key = (chat_id, kind)
+    cached = inline_answers.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    if kind == "hw":
+        hw = load_homework(chat_id)
+        text = render_homework_list(chat_id, hw) if hw else "No homework"
+    else:
+        schedule = load_group_timetable(chat_id)
+        if not schedule:
+            text = "No timetable"
+        elif kind == "today":
+            text = render_day_timetable(schedule, chat_today(chat_id))
+        else:
+            text = render_next_lesson(schedule, chat_today(chat_id))
+    
+    # Relative deadline statuses go stale, so cached answers also expire
+    inline_answers[key] = (time.monotonic() + INLINE_CACHE_TIME, text)
+    return text
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.inline_query
+    chat_id = context.user_data.get("home_chat")
+    
+    if chat_id is None:
+        await query.answer(
+            [],
+            cache_time=0,
+            is_personal=True,
+            button=InlineQueryResultsButton("Use the bot in your group first", start_parameter="inline"),
+        )
+        return
+    
+    text = query.query.strip().lower()
+    kinds = [kind for kind in INLINE_QUERIES if kind.startswith(text)] or list(INLINE_QUERIES)
+    
+    results = []
+    for kind in kinds:
+        title, description = INLINE_QUERIES[kind]
+        results.append(InlineQueryResultArticle(
+            id=kind,
+            title=title,
+            description=description,
+            input_message_content=InputTextMessageContent(get_inline_answer(chat_id, kind), parse_mode='MarkdownV2'),
+        ))
+    
+    # Answers depend on the user's group, so Telegram must not share them between users
+    await query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True)
+
+def ics_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+def fold_ics_line(line: str) -> str:
+    """Fold at 75 octets as RFC 5545 requires, never inside a UTF-8 sequence"""
+    data = line.encode("utf-8")
+    parts = []
+    limit = 75
+    while len(data) > limit:
+        cut = limit
+        while data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+        limit = 74  # continuation lines start with a space
+    parts.append(data.decode("utf-8"))
+    return "\r\n ".join(parts)
+
+def iso_year_end(year: int) -> datetime.date:
+    """Sunday of the last ISO week, where the ч/н / н/ч alternation restarts"""
+    return datetime.date.fromisocalendar(year, datetime.date(year, 12, 28).isocalendar()[1], 7)
+
+def ics_offset(offset: datetime.timedelta) -> str:
+    minutes = int(offset.total_seconds() // 60)
+    return f"{'+' if minutes >= 0 else '-'}{abs(minutes) // 60:02d}{abs(minutes) % 60:02d}"
+
+def render_vtimezone(zone: ZoneInfo, start: datetime.date, end: datetime.date) -> List[str]:
+    """VTIMEZONE with one STANDARD/DAYLIGHT observance per offset change from start to end.
+
+    Transitions come from zoneinfo, found with a daily scan and narrowed down
+    to the minute. The feed is rebuilt every ISO year, which moves the range.
+    """
+    utc = datetime.timezone.utc
+    
+    def observance(at: datetime.datetime, before: datetime.timedelta) -> List[str]:
+        local = at.astimezone(zone)
+        return [
+            f"BEGIN:{'DAYLIGHT' if local.dst() else 'STANDARD'}",
+            # Wall-clock time of the change, still in the old offset
+            f"DTSTART:{(at + before).replace(tzinfo=None):%Y%m%dT%H%M%S}",
+            f"TZOFFSETFROM:{ics_offset(before)}",
+            f"TZOFFSETTO:{ics_offset(local.utcoffset())}",
+            f"TZNAME:{local.tzname()}",
+            f"END:{'DAYLIGHT' if local.dst() else 'STANDARD'}",
+        ]
+    
+    moment = datetime.datetime.combine(start, datetime.time.min, utc)
+    offset = moment.astimezone(zone).utcoffset()
+    lines = ["BEGIN:VTIMEZONE", f"TZID:{zone.key}", *observance(moment, offset)]
+    day = datetime.timedelta(days=1)
+    while moment.date() < end:
+        if (moment + day).astimezone(zone).utcoffset() != offset:
+            # First minute of the day with the new offset
+            low, high = 0, 24 * 60
+            while high - low > 1:
+                middle = (low + high) // 2
+                if (moment + datetime.timedelta(minutes=middle)).astimezone(zone).utcoffset() == offset:
+                    low = middle
+                else:
+                    high = middle
+            change = moment + datetime.timedelta(minutes=high)
+            lines.extend(observance(change, offset))
+            offset = change.astimezone(zone).utcoffset()
+        moment += day
+    lines.append("END:VTIMEZONE")
+    return lines
+
+def render_calendar(chat_id: int, today: datetime.date) -> bytes:
+    zone = get_chat_tz(chat_id)
+    config = load_group_config(chat_id)
+    lesson_times = config.get("lesson_times", DEFAULT_LESSON_TIMES)
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    monday = today - datetime.timedelta(days=today.weekday())
+    iso_year = monday.isocalendar()[0]
+    
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//vormizduxt//homework bot//EN",
+        "CALSCALE:GREGORIAN",
+        "X-WR-CALNAME:Homework",
+        # Covers every lesson series below, homework events are all-day and zone-free
+        *render_vtimezone(zone, monday - datetime.timedelta(days=7), iso_year_end(iso_year + 1) + datetime.timedelta(days=1)),
+    ]
     
-    await update.message.reply_text("No upcoming lessons", parse_mode='MarkdownV2')
+    def add_lesson(uid: str, first: datetime.date, at: str, rule: str, lesson: Dict):
+        start = datetime.datetime.combine(first, datetime.time.fromisoformat(at))
+        end = start + datetime.timedelta(minutes=LESSON_MINUTES)
+        summary = lesson["subject"].strip()
+        if lesson.get("type", "").strip():
+            summary += f" ({lesson['type'].strip()})"
+        lines.extend([
+            "BEGIN:VEVENT",
+            f"UID:{uid}",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART;TZID={zone.key}:{start:%Y%m%dT%H%M%S}",
+            f"DTEND;TZID={zone.key}:{end:%Y%m%dT%H%M%S}",
+            f"RRULE:{rule}",
+            f"SUMMARY:{ics_escape(summary)}",
+        ])
+        if lesson.get("room", "").strip():
+            lines.append(f"LOCATION:{ics_escape(lesson['room'].strip())}")
+        lines.append("END:VEVENT")
+    
+    days_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    
+    for day_idx, day_name in enumerate(days_order):
+        for i, lesson in enumerate(config.get("timetable", {}).get(day_name, [])):
+            if not lesson.get("subject", "").strip() or i >= len(lesson_times):
+                continue
+            
+            uid = f"lesson-{day_idx}-{i}-{chat_id}"
+            if "week" not in lesson:
+                first = monday + datetime.timedelta(days=day_idx)
+                add_lesson(f"{uid}@vormizduxt", first, lesson_times[i], "FREQ=WEEKLY", lesson)
+                continue
+            
+            # Week parity follows ISO week numbers, so every ISO year gets its own series
+            for year in (iso_year, iso_year + 1):
+                start = monday if year == iso_year else datetime.date.fromisocalendar(year, 1, 1)
+                first = start + datetime.timedelta(days=day_idx)
+                if not is_lesson_this_week(lesson, first):
+                    first += datetime.timedelta(days=7)
+                year_end = iso_year_end(year)
+                if first > year_end:
+                    continue
+                until = day_start(zone, year_end + datetime.timedelta(days=1)).astimezone(datetime.timezone.utc)
+                rule = f"FREQ=WEEKLY;INTERVAL=2;UNTIL={until:%Y%m%dT%H%M%SZ}"
+                add_lesson(f"{uid}-{year}@vormizduxt", first, lesson_times[i], rule, lesson)
+    
+    for subj, tasks in load_homework(chat_id).items():
+        for task in tasks:
+            try:
+                due = datetime.date.fromisoformat(task["due"])
+            except ValueError:
+                continue  # TBD
+            text = get_task_text(task)
+            uid = hashlib.sha1(f"{chat_id}\0{subj}\0{text}\0{task['due']}".encode("utf-8")).hexdigest()
+            lines.extend([
+                "BEGIN:VEVENT",
+                f"UID:{uid}@vormizduxt",
+                f"DTSTAMP:{stamp}",
+                f"DTSTART;VALUE=DATE:{due:%Y%m%d}",
+                f"DTEND;VALUE=DATE:{due + datetime.timedelta(days=1):%Y%m%d}",
+                f"SUMMARY:{ics_escape(f'Due: {subj}')}",
+                f"DESCRIPTION:{ics_escape(text)}",
+                "TRANSP:TRANSPARENT",
+                "END:VEVENT",
+            ])
+    
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(fold_ics_line(line) for line in lines) + "\r\n").encode("utf-8")
+
+def get_calendar_feed(chat_id: int) -> Tuple[str, bytes]:
+    """(etag, body) of the chat's .ics feed, regenerated only after its data changed"""
+    today = chat_today(chat_id)
+    iso_year = today.isocalendar()[0]
+    cached = calendar_feeds.get(chat_id)
+    if cached and cached[0] == iso_year:
+        return cached[1], cached[2]
+    
+    body = render_calendar(chat_id, today)
+    etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+    calendar_feeds[chat_id] = (iso_year, etag, body)
+    return etag, body
+
+def calendar_token(chat_id: int) -> str:
+    return hmac.new(TOKEN.encode(), str(chat_id).encode(), hashlib.sha256).hexdigest()[:24]
+
+def calendar_url(chat_id: int) -> Optional[str]:
+    if not (CALENDAR_PORT and CALENDAR_BASE_URL):
+        return None
+    return f"{CALENDAR_BASE_URL.rstrip('/')}/calendar/{chat_id}/{calendar_token(chat_id)}.ics"
+
+CALENDAR_PATH_RE = re.compile(r"^/calendar/(-?\d+)/([0-9a-f]+)\.ics$")
+
+async def handle_calendar_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Minimal HTTP/1.1 GET/HEAD for subscribed feeds, answers 304 on a matching If-None-Match"""
+    try:
+        async with asyncio.timeout(10):
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while len(headers) < 64:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+        
+        method = request_line[0] if len(request_line) == 3 else ""
+        match = CALENDAR_PATH_RE.match(request_line[1]) if method in ("GET", "HEAD") else None
+        etag = None
+        body = b""
+        
+        if not match or not hmac.compare_digest(match.group(2), calendar_token(int(match.group(1)))):
+            status = "404 Not Found"
+        elif not os.path.exists(get_config_file(int(match.group(1)))):
+            status = "404 Not Found"
+        else:
+            etag, body = get_calendar_feed(int(match.group(1)))
+            if etag in [tag.strip() for tag in headers.get("if-none-match", "").split(",")]:
+                status, body = "304 Not Modified", b""
+            else:
+                status = "200 OK"
+        
+        head = [f"HTTP/1.1 {status}", f"Content-Length: {len(body)}", "Connection: close"]
+        if etag:
+            head += [f"ETag: {etag}", "Cache-Control: no-cache"]
+        if body:
+            head.append("Content-Type: text/calendar; charset=utf-8")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + (body if method == "GET" else b""))
+        await writer.drain()
+    except (TimeoutError, ConnectionError, ValueError) as e:
+        logger.debug(f"Calendar request failed: {e}")
+    except Exception as e:
+        logger.error(f"Error serving calendar feed: {e}")
+    finally:
+        writer.close()
+
+async def calendar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = get_chat_id(update)
+    etag, body = get_calendar_feed(chat_id)
+    
+    caption = "Import into your calendar app"
+    url = calendar_url(chat_id)
+    if url:
+        caption += f"\nOr subscribe to stay in sync: {url}"
+    
+    # An unchanged feed is resent by file_id instead of uploading it again
+    cached = calendar_file_ids.get(chat_id)
+    document = cached[1] if cached and cached[0] == etag else InputFile(body, filename="homework.ics")
+    message = await update.message.reply_document(document, caption=caption)
+    calendar_file_ids[chat_id] = (etag, message.document.file_id)
 
 async def motivate(update: Update, context: ContextTypes.DEFAULT_TYPE):
     quotes = [
@@ -872,27 +2416,334 @@ async def kys(update: Update, context: ContextTypes.DEFAULT_TYPE):
     ]
     await update.message.reply_text(escape_markdown_v2(random.choice(messages)), parse_mode='MarkdownV2')
 
-async def send_reminder_to_group(app: Application, chat_id: int, message: str):
-    """Send reminder with error handling"""
+async def measure_loop_lag(samples: List[float], interval: float = 0.05):
+    """Record how late each short sleep wakes up, i.e. how long the loop was blocked"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - started - interval)
+
+def format_perf_report(
+    seconds: int,
+    stats: pstats.Stats,
+    lag_samples: List[float],
+    handlers_before: Dict[str, List[float]],
+    io_before: Dict[str, float],
+) -> str:
+    lines = [f"Profile of {seconds}s (cProfile, adds overhead)", ""]
+    
+    if lag_samples:
+        avg_lag = sum(lag_samples) / len(lag_samples) * 1000
+        lines.append(f"Loop lag: avg {avg_lag:.1f} ms, max {max(lag_samples) * 1000:.1f} ms, {len(lag_samples)} samples")
+    
+    updates = app.update_processor.metrics()
+    lines.append(
+        f"Updates: {updates['pending']} pending (max {updates['max_pending']}), "
+        f"{updates['queued_chats']} chats queued, deepest chat queue {updates['max_chat_depth']}, "
+        f"wait avg {updates['avg_wait_ms']} ms / max {updates['max_wait_ms']} ms"
+    )
+    
+    reads = storage_io["reads"] - io_before["reads"]
+    writes = storage_io["writes"] - io_before["writes"]
+    lines.append(
+        f"Storage: {reads} reads {storage_io['read_ms'] - io_before['read_ms']:.1f} ms, "
+        f"{writes} writes {storage_io['write_ms'] - io_before['write_ms']:.1f} ms"
+    )
+    
+    limits = (
+        f"Rate limits since start: {rate_limit_metrics['allowed']} allowed, "
+        f"{rate_limit_metrics['coalesced']} coalesced, {rate_limit_metrics['throttled']} throttled, "
+        f"{rate_limit_metrics['dropped']} dropped"
+    )
+    if rate_limit_by_command:
+        most_limited = sorted(rate_limit_by_command.items(), key=lambda item: item[1], reverse=True)[:5]
+        limits += "; limited most: " + ", ".join(f"/{command} {count}" for command, count in most_limited)
+    lines.append(limits)
+    lines.append(
+        f"Reminders since start: {reminder_latency['fires']} fires, {reminder_latency['delivered']} delivered, "
+        f"{reminder_latency['failed']} failed, {len(reminder_retries)} waiting to retry, "
+        f"max fire-to-delivery {reminder_latency['max_ms']:.0f} ms"
+    )
+    
+    handler_split = []
+    for label, (count, total, _) in app.update_processor.handler_times.items():
+        before = handlers_before.get(label, [0, 0.0, 0.0])
+        if count > before[0]:
+            handler_split.append((total - before[1], count - before[0], label))
+    if handler_split:
+        lines += ["", "Handlers (total ms / calls / avg ms):"]
+        for total, count, label in sorted(handler_split, reverse=True)[:10]:
+            lines.append(f"{total * 1000:9.1f} {count:6d} {total / count * 1000:8.1f}  {label}")
+    
+    lines += ["", "Hot functions (own ms / cumulative ms / calls):"]
+    # Time spent waiting in the selector is idle time, not work
+    busy = [
+        item for item in stats.stats.items()
+        if not (item[0][0].endswith("selectors.py") or (item[0][0] == "~" and "select." in item[0][2]))
+    ]
+    hot = sorted(busy, key=lambda item: item[1][2], reverse=True)[:15]
+    for (filename, line, func), (_, calls, own, cumulative, _) in hot:
+        lines.append(
+            f"{own * 1000:9.1f} {cumulative * 1000:9.1f} {calls:7d}  {func} ({os.path.basename(filename)}:{line})"
+        )
+    
+    return "\n".join(lines)
+
+async def run_perf_session(bot, chat_id: int, seconds: int):
+    """Profile everything the loop runs for the given time, then report to chat_id"""
+    handlers_before = {label: list(times) for label, times in app.update_processor.handler_times.items()}
+    io_before = dict(storage_io)
+    lag_samples: List[float] = []
+    lag_task = asyncio.create_task(measure_loop_lag(lag_samples))
+    
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+        lag_task.cancel()
+    
     try:
-        await app.bot.send_message(chat_id=chat_id, text=message, parse_mode='MarkdownV2')
-        logger.info(f"Reminder sent to {chat_id}")
+        stats = pstats.Stats(profiler)
+        report = format_perf_report(seconds, stats, lag_samples, handlers_before, io_before)
+        report = report.replace("\\", "\\\\").replace("`", "\\`")[:4000]
+        await bot.send_message(chat_id, f"```\n{report}\n```", parse_mode='MarkdownV2')
+        await bot.send_document(
+            chat_id,
+            InputFile(marshal.dumps(stats.stats), filename=f"perf-{int(time.time())}.prof"),
+            caption="Raw stats, open with pstats or snakeviz",
+        )
     except Exception as e:
-        logger.error(f"Failed to send reminder to {chat_id}: {e}")
+        logger.error(f"Failed to send profile to {chat_id}: {e}")
 
-async def check_and_send_reminders():
-    """Check and send reminders based on time"""
-    global app, last_reminder_data
+async def debug_perf(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    global perf_task
+    user = update.effective_user
     
-    if not app:
+    if not user or user.id not in ADMIN_IDS:
+        await update.message.reply_text("Admins only", parse_mode='MarkdownV2')
+        return
+    
+    if perf_task and not perf_task.done():
+        await update.message.reply_text("A profile is already running", parse_mode='MarkdownV2')
         return
     
     try:
-        now = datetime.datetime.now(ARMENIA_TZ)
-        current_time = now.strftime("%H:%M")
-        today = now.date()
-        tomorrow = today + datetime.timedelta(days=1)
-        
+        seconds = int(context.args[0]) if context.args else 10
+    except ValueError:
+        seconds = 10
+    seconds = max(1, min(seconds, PERF_MAX_SECONDS))
+    
+    # In the background, otherwise this chat's updates would queue behind the sleep
+    perf_task = asyncio.create_task(run_perf_session(context.bot, get_chat_id(update), seconds))
+    await update.message.reply_text(f"Profiling for {seconds}s\\.\\.\\.", parse_mode='MarkdownV2')
+
+CONFIG_FILE_RE = re.compile(r"^config_(-?\d+)\.json$")
+
+def iter_chat_ids():
+    """Chat ids taken from config file names as the directory is read, no config is opened"""
+    with os.scandir(DATA_DIR) as entries:
+        for entry in entries:
+            match = CONFIG_FILE_RE.match(entry.name)
+            if match:
+                yield int(match.group(1))
+
+def save_broadcast_checkpoint(state: Dict[str, Any]):
+    tmp_file = BROADCAST_FILE + ".tmp"
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_file, BROADCAST_FILE)
+    except Exception as e:
+        logger.error(f"Error saving broadcast checkpoint: {e}")
+
+async def send_broadcast_message(chat_id: int, text: str) -> Optional[str]:
+    """None when delivered, otherwise why not"""
+    error = "gave up after retries"
+    for attempt in range(3):
+        try:
+            await app.bot.send_message(chat_id=chat_id, text=text)
+            return None
+        except RetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+        except Forbidden:
+            return "bot blocked or removed"
+        except BadRequest as e:
+            return str(e)
+        except NetworkError as e:
+            # TimedOut included, the message may or may not have arrived
+            error = f"gave up after retries: {e}"
+            await asyncio.sleep(2 ** attempt)
+    return error
+
+async def run_broadcast(state: Dict[str, Any]):
+    """Fan the message out to every chat with a config, at most BROADCAST_CONCURRENCY sends
+    in flight and BROADCAST_RATE per second, checkpointing every BROADCAST_CHECKPOINT_EVERY sends.
+    """
+    global broadcast_progress
+    broadcast_progress = state
+    handled = set(state["delivered"]) | {int(chat_id) for chat_id in state["failed"]}
+    bucket = TokenBucket(BROADCAST_RATE, BROADCAST_CONCURRENCY, time.monotonic())
+    queue: asyncio.Queue = asyncio.Queue(maxsize=BROADCAST_CONCURRENCY * 2)
+    since_checkpoint = 0
+    
+    async def produce():
+        for chat_id in iter_chat_ids():
+            if chat_id not in handled:
+                await queue.put(chat_id)
+        for _ in range(BROADCAST_CONCURRENCY):
+            await queue.put(None)
+    
+    async def send_all():
+        nonlocal since_checkpoint
+        while (chat_id := await queue.get()) is not None:
+            while bucket.refill(time.monotonic()) < 1:
+                await asyncio.sleep(bucket.wait_time(1))
+            bucket.tokens -= 1
+            
+            error = await send_broadcast_message(chat_id, state["text"])
+            if error is None:
+                state["delivered"].append(chat_id)
+            else:
+                state["failed"][str(chat_id)] = error
+            
+            since_checkpoint += 1
+            if since_checkpoint >= BROADCAST_CHECKPOINT_EVERY:
+                since_checkpoint = 0
+                save_broadcast_checkpoint(state)
+    
+    try:
+        await asyncio.gather(produce(), *(send_all() for _ in range(BROADCAST_CONCURRENCY)))
+    except asyncio.CancelledError:
+        save_broadcast_checkpoint(state)
+        logger.info(f"Broadcast interrupted after {len(state['delivered'])} chats, checkpoint saved")
+        raise
+    except Exception as e:
+        save_broadcast_checkpoint(state)
+        logger.error(f"Broadcast failed, checkpoint saved: {e}", exc_info=True)
+        return
+    
+    reasons = collections.Counter(state["failed"].values())
+    report = (
+        f"Broadcast finished in {time.time() - state['started']:.0f}s\n"
+        f"Delivered: {len(state['delivered'])}\n"
+        f"Failed: {len(state['failed'])}"
+    )
+    for reason, count in reasons.most_common(5):
+        report += f"\n  {count} x {reason}"
+    logger.info(report.replace("\n", ", "))
+    
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(BROADCAST_FILE)
+    broadcast_progress = None
+    try:
+        await app.bot.send_message(chat_id=state["admin_chat"], text=report)
+    except Exception as e:
+        logger.error(f"Failed to send broadcast report: {e}")
+
+async def stop_broadcast():
+    """Cancel a running broadcast, which leaves its checkpoint for the next start"""
+    if broadcast_task and not broadcast_task.done():
+        broadcast_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await broadcast_task
+
+async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    global broadcast_task, broadcast_progress
+    user = update.effective_user
+    
+    if not user or user.id not in ADMIN_IDS:
+        await update.message.reply_text("Admins only", parse_mode='MarkdownV2')
+        return
+    
+    # Everything after the command, newlines included
+    text = update.message.text.partition(" ")[2].strip()
+    running = broadcast_task is not None and not broadcast_task.done()
+    
+    if text == "status":
+        if not broadcast_progress:
+            await update.message.reply_text("No broadcast running", parse_mode='MarkdownV2')
+            return
+        await update.message.reply_text(
+            f"{len(broadcast_progress['delivered'])} delivered, {len(broadcast_progress['failed'])} failed so far"
+        )
+        return
+    
+    if text == "cancel":
+        if not running:
+            await update.message.reply_text("No broadcast running", parse_mode='MarkdownV2')
+            return
+        await stop_broadcast()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(BROADCAST_FILE)
+        await update.message.reply_text(
+            f"Cancelled after {len(broadcast_progress['delivered'])} chats", parse_mode='MarkdownV2'
+        )
+        broadcast_progress = None
+        return
+    
+    if not text:
+        await update.message.reply_text(
+            "Usage: `/broadcast <text>`, `/broadcast status` or `/broadcast cancel`",
+            parse_mode='MarkdownV2'
+        )
+        return
+    
+    if running:
+        await update.message.reply_text("A broadcast is already running", parse_mode='MarkdownV2')
+        return
+    
+    state = {
+        "text": text,
+        "admin_chat": get_chat_id(update),
+        "started": time.time(),
+        "delivered": [],
+        "failed": {},
+    }
+    save_broadcast_checkpoint(state)
+    broadcast_task = asyncio.create_task(run_broadcast(state))
+    await update.message.reply_text("Broadcasting, a report follows when done", parse_mode='MarkdownV2')
+
+async def send_reminder_to_group(app: Application, chat_id: int, message: str) -> bool:
+    """True when delivered, False when the chat can't get it (blocked, bad request).
+
+    RetryAfter and network errors (TimedOut included) are retried a few times,
+    then raised so the caller can try again later.
+    """
+    for attempt in range(3):
+        try:
+            await app.bot.send_message(chat_id=chat_id, text=message, parse_mode='MarkdownV2')
+            logger.info(f"Reminder sent to {chat_id}")
+            return True
+        except RetryAfter as e:
+            if attempt == 2:
+                raise
+            await asyncio.sleep(e.retry_after)
+        except (Forbidden, BadRequest) as e:
+            logger.error(f"Failed to send reminder to {chat_id}: {e}")
+            return False
+        except NetworkError:
+            if attempt == 2:
+                raise
+            await asyncio.sleep(2 ** attempt)
+        except Exception as e:
+            logger.error(f"Failed to send reminder to {chat_id}: {e}")
+            return False
+
+def get_dashboard_chats() -> Set[int]:
+    """Chats with a pinned dashboard, from the cached config scan"""
+    get_reminder_schedule()
+    return dashboard_chats
+
+def get_reminder_schedule() -> List[Tuple[int, str, str, bool]]:
+    """(chat_id, morning_time, evening_time, has_dashboard) of chats with reminders on,
+    rebuilt after config saves. Also collects dashboard_chats."""
+    global reminder_schedule, dashboard_chats
+    if reminder_schedule is None:
+        schedule = []
+        dashboards = set()
         for filename in os.listdir(DATA_DIR):
             if not filename.startswith("config_"):
                 continue
@@ -901,76 +2752,189 @@ async def check_and_send_reminders():
                 chat_id = int(filename.replace("config_", "").replace(".json", ""))
             except ValueError:
                 continue
-                
-            config = load_group_config(chat_id)
             
-            if not config.get("reminders_enabled", True):
-                continue
-            
-            morning_time = config.get("morning_reminder", "08:00")
-            evening_time = config.get("evening_reminder", "18:00")
+            config = load_group_config(chat_id)
+            if config.get("dashboard"):
+                dashboards.add(chat_id)
+            if config.get("reminders_enabled", True):
+                schedule.append((
+                    chat_id,
+                    config.get("morning_reminder", "08:00"),
+                    config.get("evening_reminder", "18:00"),
+                    bool(config.get("dashboard")),
+                ))
+        reminder_schedule = schedule
+        dashboard_chats = dashboards
+    return reminder_schedule
+
+def render_morning_digest(chat_id: int, day: datetime.date) -> Optional[str]:
+    """Today's lessons"""
+    schedule = load_group_timetable(chat_id)
+    day_name = day.strftime('%A')
+    
+    lessons_today = []
+    for lesson in schedule.get(day_name) or []:
+        if is_lesson_this_week(lesson, day):
+            subj = lesson.get("subject", "").strip()
+            room = lesson.get("room", "").strip()
+            ltype = lesson.get("type", "").strip()
             
+            if subj:
+                lesson_info = subj
+                if ltype:
+                    lesson_info += f" ({ltype})"
+                if room:
+                    lesson_info += f" - {room}"
+                lessons_today.append(lesson_info)
+    
+    if not lessons_today:
+        return None
+    
+    msg = f"🌅 *Today's Lessons*\n\n"
+    for i, lesson_info in enumerate(lessons_today, 1):
+        msg += f"`{i}` {escape_markdown_v2(lesson_info)}\n"
+    return msg
+
+def render_evening_digest(chat_id: int, day: datetime.date) -> Optional[str]:
+    """Homework due tomorrow at 00:00"""
+    tomorrow = (day + datetime.timedelta(days=1)).isoformat()
+    hw = load_homework(chat_id)
+    
+    tomorrow_hw = []
+    for subj, tasks in hw.items():
+        for task in tasks:
+            if task["due"] == tomorrow:
+                tomorrow_hw.append((subj, task))
+    
+    if not tomorrow_hw:
+        return None
+    
+    msg = f"🌙 *Due Tomorrow at 00:00*\n\n"
+    for subj, task in tomorrow_hw[:5]:
+        preview = task_preview(task, 60)
+        msg += f"*{escape_markdown_v2(subj)}*\n{escape_markdown_v2(preview)}\n\n"
+    
+    if len(tomorrow_hw) > 5:
+        msg += f"_\\.\\.\\. {len(tomorrow_hw) - 5} more_"
+    return msg
+
+def get_digest(chat_id: int, kind: str, day: datetime.date) -> Optional[str]:
+    """Pre-rendered digest, rendered now if it is missing or was invalidated"""
+    key = (chat_id, kind, day.isoformat())
+    if key not in prerendered_digests:
+        render = render_morning_digest if kind == "morning" else render_evening_digest
+        prerendered_digests[key] = render(chat_id, day)
+    return prerendered_digests[key]
+
+def next_fire_time(now: datetime.datetime, at: str) -> Optional[datetime.datetime]:
+    """Next local datetime (after the current minute) at which an "HH:MM" reminder fires"""
+    try:
+        hour, minute = map(int, at.split(":"))
+        fire = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    except ValueError:
+        return None
+    if fire <= now:
+        fire = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), fire.timetz())
+    return fire
+
+async def dispatch_reminders(due: List[Tuple[int, str, datetime.date, str]], fire_at: datetime.datetime):
+    """Send the reminders due this minute, at most REMINDER_CONCURRENCY in flight and
+    REMINDER_RATE per second, and report fire-to-delivery latency.
+
+    A reminder only counts as sent once delivered (or undeliverable). One that
+    still fails after retries goes to reminder_retries for the next minute.
+    """
+    semaphore = asyncio.Semaphore(REMINDER_CONCURRENCY)
+    bucket = TokenBucket(REMINDER_RATE, REMINDER_CONCURRENCY, time.monotonic())
+    
+    async def deliver(chat_id: int, kind: str, day: datetime.date, reminder_key: str) -> Optional[float]:
+        msg = get_digest(chat_id, kind, day)
+        if msg is not None:
+            async with semaphore:
+                while bucket.refill(time.monotonic()) < 1:
+                    await asyncio.sleep(bucket.wait_time(1))
+                bucket.tokens -= 1
+                try:
+                    delivered = await send_reminder_to_group(app, chat_id, msg)
+                except (RetryAfter, NetworkError) as e:
+                    logger.warning(f"Reminder to {chat_id} not sent ({e}), retrying next minute")
+                    reminder_retries.setdefault(reminder_key, (chat_id, kind, day, fire_at))
+                    return None
+        
+        last_reminder_data[reminder_key] = True
+        reminder_retries.pop(reminder_key, None)
+        if msg is None:
+            return None
+        if not delivered:
+            reminder_latency["failed"] += 1
+            return None
+        return (datetime.datetime.now(datetime.timezone.utc) - fire_at).total_seconds() * 1000
+    
+    results = await asyncio.gather(*(deliver(*reminder) for reminder in due))
+    latencies = sorted(latency for latency in results if latency is not None)
+    reminder_latency["fires"] += 1
+    if latencies:
+        reminder_latency["delivered"] += len(latencies)
+        reminder_latency["max_ms"] = max(reminder_latency["max_ms"], latencies[-1])
+        logger.info(
+            f"Reminders delivered to {len(latencies)} chats, fire-to-delivery "
+            f"p50 {latencies[len(latencies) // 2]:.0f}ms, max {latencies[-1]:.0f}ms"
+        )
+
+async def check_and_send_reminders():
+    """Send reminders due this minute and pre-render the ones due within PRERENDER_MINUTES"""
+    global app, last_reminder_data
+    
+    if not app:
+        return
+    
+    try:
+        utc_now = datetime.datetime.now(datetime.timezone.utc)
+        fire_at = utc_now.replace(second=0, microsecond=0)
+        due = []
+        
+        for reminder_key, (chat_id, kind, day, first_fire) in list(reminder_retries.items()):
+            if fire_at - first_fire > datetime.timedelta(minutes=REMINDER_RETRY_MINUTES):
+                del reminder_retries[reminder_key]
+                reminder_latency["failed"] += 1
+                logger.error(f"Giving up on the {kind} reminder to {chat_id} after {REMINDER_RETRY_MINUTES} minutes")
+            else:
+                due.append((chat_id, kind, day, reminder_key))
+        
+        for chat_id, morning_time, evening_time, has_dashboard in get_reminder_schedule():
+            now = utc_now.astimezone(get_chat_tz(chat_id))
+            current_time = now.strftime("%H:%M")
+            today = now.date()
             reminder_key = f"{chat_id}_{current_time}_{today.isoformat()}"
             
-            if reminder_key in last_reminder_data:
-                continue
+            if has_dashboard and fire_at.minute == 0:
+                # Relative deadlines ("5h left") drift, refresh the pinned overview hourly
+                schedule_dashboard_update(chat_id)
             
-            # Morning reminder: Today's lessons
-            if current_time == morning_time:
-                schedule = load_group_timetable(chat_id)
-                day_name = today.strftime('%A')
+            for kind, at in (("morning", morning_time), ("evening", evening_time)):
+                # The pinned dashboard replaces the evening homework message
+                if kind == "evening" and has_dashboard:
+                    continue
                 
-                if day_name in schedule and schedule[day_name]:
-                    lessons_today = []
-                    for lesson in schedule[day_name]:
-                        if is_lesson_this_week(lesson, today):
-                            subj = lesson.get("subject", "").strip()
-                            room = lesson.get("room", "").strip()
-                            ltype = lesson.get("type", "").strip()
-                            
-                            if subj:
-                                lesson_info = subj
-                                if ltype:
-                                    lesson_info += f" ({ltype})"
-                                if room:
-                                    lesson_info += f" - {room}"
-                                lessons_today.append(lesson_info)
-                    
-                    if lessons_today:
-                        msg = f"🌅 *Today's Lessons*\n\n"
-                        for i, lesson_info in enumerate(lessons_today, 1):
-                            msg += f"`{i}` {escape_markdown_v2(lesson_info)}\n"
-                        
-                        await send_reminder_to_group(app, chat_id, msg)
-                        last_reminder_data[reminder_key] = True
-            
-            # Evening reminder: Homework due tomorrow at 00:00
-            elif current_time == evening_time:
-                hw = load_homework(chat_id)
+                if current_time == at:
+                    if reminder_key not in last_reminder_data and reminder_key not in reminder_retries:
+                        due.append((chat_id, kind, today, reminder_key))
+                    break
                 
-                # Find homework due tomorrow (deadline is at 00:00 tomorrow)
-                tomorrow_hw = []
-                for subj, tasks in hw.items():
-                    for task in tasks:
-                        if task["due"] == tomorrow.isoformat():
-                            tomorrow_hw.append((subj, task))
-                
-                if tomorrow_hw:
-                    msg = f"🌙 *Due Tomorrow at 00:00*\n\n"
-                    for subj, task in tomorrow_hw[:5]:
-                        preview = task['task'][:60] if len(task['task']) <= 60 else task['task'][:60] + "..."
-                        msg += f"*{escape_markdown_v2(subj)}*\n{escape_markdown_v2(preview)}\n\n"
-                    
-                    if len(tomorrow_hw) > 5:
-                        msg += f"_\\.\\.\\. {len(tomorrow_hw) - 5} more_"
-                    
-                    await send_reminder_to_group(app, chat_id, msg)
-                    last_reminder_data[reminder_key] = True
+                fire = next_fire_time(now, at)
+                if fire and fire - now <= datetime.timedelta(minutes=PRERENDER_MINUTES):
+                    get_digest(chat_id, kind, fire.date())
         
-        # Clean old reminder data
-        keys_to_remove = [k for k in last_reminder_data.keys() if k.split('_')[-1] != today.isoformat()]
+        if due:
+            await dispatch_reminders(due, fire_at)
+        
+        # Clean old reminder data (chats in other zones may be a day ahead or behind UTC)
+        oldest_kept = (utc_now.date() - datetime.timedelta(days=1)).isoformat()
+        keys_to_remove = [k for k in last_reminder_data.keys() if k.split('_')[-1] < oldest_kept]
         for k in keys_to_remove:
             del last_reminder_data[k]
+        for key in [key for key in prerendered_digests if key[2] < oldest_kept]:
+            del prerendered_digests[key]
     
     except Exception as e:
         logger.error(f"Error in reminders: {e}", exc_info=True)
@@ -981,8 +2945,9 @@ async def reminder_loop():
     while not shutdown_event.is_set():
         try:
             await check_and_send_reminders()
-            # Wait for 60 seconds or until the shutdown event is set
-            await asyncio.wait_for(shutdown_event.wait(), timeout=60)
+            # Wake at the start of the next minute (or when the shutdown event is set)
+            # so reminders fire right on their HH:MM
+            await asyncio.wait_for(shutdown_event.wait(), timeout=60.05 - time.time() % 60)
         except asyncio.TimeoutError:
             # Expected on timeout, continue loop
             pass
@@ -994,14 +2959,128 @@ async def reminder_loop():
             await asyncio.sleep(60)
     logger.info("Reminder loop stopped")
 
-def signal_handler(signum, frame):
+WATCHED_FILE_RE = re.compile(r"^(?:config|homework)_(-?\d+)\.(?:json|journal|snapshot\.json)$")
+
+def note_own_write(path: str):
+    """Remember the mtime of a file the bot wrote so the watcher does not reload it"""
+    if not DATA_WATCH_INTERVAL:
+        return
+    try:
+        data_mtimes[path] = os.stat(path).st_mtime_ns
+    except OSError:
+        pass
+
+def scan_data_dir() -> Dict[str, int]:
+    mtimes = {}
+    with os.scandir(DATA_DIR) as entries:
+        for entry in entries:
+            if WATCHED_FILE_RE.match(entry.name):
+                try:
+                    mtimes[entry.path] = entry.stat().st_mtime_ns
+                except FileNotFoundError:
+                    pass
+    return mtimes
+
+async def watch_data_dir():
+    """Poll DATA_DIR mtimes and reload chats whose files were edited, added or removed by hand"""
+    global reminder_schedule
+    data_mtimes.update(await asyncio.to_thread(scan_data_dir))
+    
+    while not shutdown_event.is_set():
+        try:
+            await asyncio.wait_for(shutdown_event.wait(), timeout=DATA_WATCH_INTERVAL)
+            break
+        except asyncio.TimeoutError:
+            pass
+        
+        try:
+            current = await asyncio.to_thread(scan_data_dir)
+        except OSError as e:
+            logger.error(f"Error scanning {DATA_DIR}: {e}")
+            continue
+        
+        changed = [path for path in current.keys() | data_mtimes.keys() if current.get(path) != data_mtimes.get(path)]
+        data_mtimes.clear()
+        data_mtimes.update(current)
+        if not changed:
+            continue
+        
+        chats = {int(WATCHED_FILE_RE.match(os.path.basename(path)).group(1)) for path in changed}
+        for chat_id in chats:
+            invalidate_chat(chat_id)
+        reminder_schedule = None
+        parse_date_text.cache_clear()
+        logger.info(f"Reloaded chats {sorted(chats)} after external changes")
+
+async def track_home_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Inline queries carry no chat, they are answered from the user's last group
+    chat = update.effective_chat
+    if chat and context.user_data is not None:
+        if chat.type != ChatType.PRIVATE or "home_chat" not in context.user_data:
+            context.user_data["home_chat"] = chat.id
+
+async def graceful_shutdown(application: Application):
+    """Stop intake, drain in-flight work up to SHUTDOWN_TIMEOUT, then stop.
+
+    updater.stop() confirms every fetched update with Telegram, so updates
+    still queued when the deadline passes are not redelivered on restart.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + SHUTDOWN_TIMEOUT
+    
+    # The reminder loop exits after its current pass once this is set
+    shutdown_event.set()
+    
+    if application.updater and application.updater.running:
+        logger.info("Stopping update polling...")
+        await application.updater.stop()
+    
+    # Resumed from its checkpoint on the next start
+    await stop_broadcast()
+    
+    # PTB marks an update task_done only after its handlers finished
+    try:
+        await asyncio.wait_for(application.update_queue.join(), timeout=max(0.0, deadline - loop.time()))
+    except asyncio.TimeoutError:
+        logger.warning(
+            f"Shutdown deadline reached with {application.update_processor.pending} updates in flight, "
+            f"{application.update_queue.qsize()} queued updates are dropped"
+        )
+    
+    if reminder_task and not reminder_task.done():
+        remaining = max(0.0, deadline - loop.time())
+        done, _ = await asyncio.wait({reminder_task}, timeout=remaining)
+        if not done:
+            logger.warning("Shutdown deadline reached before reminder sends finished")
+    
+    if dashboard_timers:
+        try:
+            await asyncio.wait_for(flush_dashboards(), timeout=max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            logger.warning("Shutdown deadline reached before dashboard edits finished")
+    
+    application.stop_running()
+
+def signal_handler(signum, frame=None):
     """Handle shutdown signals"""
+    global shutdown_task
     logger.info(f"Received signal {signum}, shutting down...")
-    shutdown_event.set()
+    
+    if app is None or not app.running:
+        # Still starting up, nothing to drain
+        shutdown_event.set()
+        raise SystemExit(0)
+    
+    if shutdown_task is None:
+        shutdown_task = asyncio.get_running_loop().create_task(graceful_shutdown(app))
+
+def reload_signal_handler(signum, frame=None):
+    """SIGHUP reloads data in place instead of shutting down"""
+    reload_data(f"signal {signum}")
 
 async def post_init(application: Application):
     """Initialize bot after startup"""
-    global app, reminder_task
+    global app, reminder_task, calendar_server, watch_task, broadcast_task
     app = application
     
     commands = [
@@ -1012,17 +3091,27 @@ async def post_init(application: Application):
         BotCommand("hw_remove", "Remove homework"),
         BotCommand("hw_today", "Due today"),
         BotCommand("hw_overdue", "Overdue"),
+        BotCommand("hw_search", "Search homework"),
+        BotCommand("hw_alias", "Subject alias"),
         BotCommand("hw_stats", "Statistics"),
         BotCommand("hw_clean", "Clean old"),
         BotCommand("timetable", "Today's schedule"),
         BotCommand("full_timetable", "Week schedule"),
         BotCommand("set_timetable", "Edit timetable"),
         BotCommand("next", "Next lesson"),
+        BotCommand("dashboard", "Pinned homework overview"),
+        BotCommand("calendar", "Export to calendar"),
         BotCommand("motivate", "Motivation"),
         BotCommand("kys", "Random"),
     ]
     
     await application.bot.set_my_commands(commands)
+    
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, signal_handler, sig)
+    loop.add_signal_handler(signal.SIGHUP, reload_signal_handler, signal.SIGHUP)
+    
     # Check if a reminder_task is already running (e.g., from a previous run or restart)
     if reminder_task and not reminder_task.done():
         reminder_task.cancel()
@@ -1033,6 +3122,18 @@ async def post_init(application: Application):
             
     # Start the reminder loop as a new task
     reminder_task = asyncio.create_task(reminder_loop())
+    
+    if CALENDAR_PORT:
+        calendar_server = await asyncio.start_server(handle_calendar_request, CALENDAR_HOST, CALENDAR_PORT)
+        logger.info(f"Calendar feed listening on {CALENDAR_HOST}:{CALENDAR_PORT}")
+    
+    if DATA_WATCH_INTERVAL:
+        watch_task = asyncio.create_task(watch_data_dir())
+    
+    pending_broadcast = load_json_file(BROADCAST_FILE)
+    if pending_broadcast:
+        logger.info(f"Resuming broadcast, {len(pending_broadcast['delivered'])} chats already handled")
+        broadcast_task = asyncio.create_task(run_broadcast(pending_broadcast))
     logger.info("Bot initialized successfully")
 
 async def post_shutdown(application: Application):
@@ -1041,6 +3142,12 @@ async def post_shutdown(application: Application):
     logger.info("Shutting down bot...")
     shutdown_event.set()
     
+    if perf_task:
+        perf_task.cancel()
+    if watch_task:
+        watch_task.cancel()
+    await stop_broadcast()
+    
     if reminder_task:
         reminder_task.cancel()
         try:
@@ -1048,6 +3155,14 @@ async def post_shutdown(application: Application):
         except asyncio.CancelledError:
             pass
     
+    if calendar_server:
+        calendar_server.close()
+        await calendar_server.wait_closed()
+    
+    logger.info(f"Update processor metrics: {application.update_processor.metrics()}")
+    logger.info(f"Request metrics: {request_metrics()}")
+    logger.info(f"Rate limit metrics: {rate_limit_metrics}, limited by command: {rate_limit_by_command}")
+    logger.info(f"Reminder metrics: {reminder_latency}, {len(reminder_retries)} waiting to retry")
     logger.info("Bot shutdown complete")
 
 def main():
@@ -1065,29 +3180,50 @@ def main():
     
     logger.info("Lock acquired successfully")
     
-    # Register system signal handlers for graceful shutdown
+    # SIGINT/SIGTERM shut down gracefully, SIGHUP reloads data in place
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    signal.signal(signal.SIGHUP, reload_signal_handler)
     
     try:
         logger.info("Building application...")
-        app = Application.builder().token(TOKEN).post_init(post_init).post_shutdown(post_shutdown).build()
+        send_request, polling_request = build_requests()
+        app = (
+            Application.builder()
+            .token(TOKEN)
+            .request(send_request)
+            .get_updates_request(polling_request)
+            .persistence(FileStoragePersistence())
+            .concurrent_updates(ChatUpdateProcessor())
+            .post_init(post_init)
+            .post_shutdown(post_shutdown)
+            .build()
+        )
         logger.info("Application built successfully")
         
         logger.info("Adding command handlers...")
+        # Read-only lookups go through the rate limiter, commands that change data do not
+        app.add_handler(TypeHandler(Update, track_home_chat), group=-1)
         app.add_handler(CommandHandler("start", start))
         app.add_handler(CommandHandler("hw_add", hw_quick_add))
-        app.add_handler(CommandHandler("hw_list", hw_list))
+        app.add_handler(CommandHandler("hw_list", rate_limited("hw_list", hw_list)))
         app.add_handler(CommandHandler("hw_remove", hw_remove))
-        app.add_handler(CommandHandler("hw_today", hw_today))
-        app.add_handler(CommandHandler("hw_overdue", hw_overdue))
-        app.add_handler(CommandHandler("hw_stats", hw_stats))
+        app.add_handler(CommandHandler("hw_today", rate_limited("hw_today", hw_today)))
+        app.add_handler(CommandHandler("hw_overdue", rate_limited("hw_overdue", hw_overdue)))
+        app.add_handler(CommandHandler("hw_search", rate_limited("hw_search", hw_search)))
+        app.add_handler(CommandHandler("hw_alias", hw_alias))
+        app.add_handler(CommandHandler("hw_stats", rate_limited("hw_stats", hw_stats)))
         app.add_handler(CommandHandler("hw_clean", hw_clean))
-        app.add_handler(CommandHandler("timetable", timetable))
-        app.add_handler(CommandHandler("full_timetable", full_timetable))
-        app.add_handler(CommandHandler("next", next_lesson))
-        app.add_handler(CommandHandler("motivate", motivate))
-        app.add_handler(CommandHandler("kys", kys))
+        app.add_handler(CommandHandler("timetable", rate_limited("timetable", timetable)))
+        app.add_handler(CommandHandler("full_timetable", rate_limited("full_timetable", full_timetable)))
+        app.add_handler(CommandHandler("next", rate_limited("next", next_lesson)))
+        app.add_handler(CommandHandler("dashboard", dashboard))
+        app.add_handler(CommandHandler("calendar", rate_limited("calendar", calendar)))
+        app.add_handler(InlineQueryHandler(inline_query))
+        app.add_handler(CommandHandler("motivate", rate_limited("motivate", motivate)))
+        app.add_handler(CommandHandler("kys", rate_limited("kys", kys)))
+        app.add_handler(CommandHandler("debug_perf", debug_perf))
+        app.add_handler(CommandHandler("broadcast", broadcast))
         
         logger.info("Adding conversation handlers...")
         long_add_handler = ConversationHandler(
@@ -1098,6 +3234,8 @@ def main():
                 LONG_ADDING_DATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_date_and_save_long)],
             },
             fallbacks=[CommandHandler("cancel", cancel_conversation)],
+            name="long_add",
+            persistent=True,
         )
         app.add_handler(long_add_handler)
         
@@ -1111,6 +3249,8 @@ def main():
                 ],
             },
             fallbacks=[CommandHandler("cancel", cancel_conversation)],
+            name="set_timetable",
+            persistent=True,
         )
         app.add_handler(timetable_handler)
         
@@ -1121,9 +3261,12 @@ def main():
         logger.info("=" * 50)
         
         # --- FIX APPLIED HERE: Removed close_loop=False to block main thread ---
+        # Signals are routed to graceful_shutdown from post_init, and updates
+        # sent while the bot was down are still delivered on start
         app.run_polling(
             allowed_updates=Update.ALL_TYPES,
-            drop_pending_updates=True
+            drop_pending_updates=False,
+            stop_signals=None
             # Note: close_loop=False was removed
         )
         
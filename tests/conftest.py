@@ -0,0 +1,62 @@
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as bot  # noqa: E402
+
+
+class FakeMessage:
+    def __init__(self, text: str = ""):
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+        return types.SimpleNamespace(message_id=len(self.replies))
+
+
+def make_update(chat_id: int, text: str = "", user_id: int = 7, update_id: int = 1):
+    return types.SimpleNamespace(
+        effective_chat=types.SimpleNamespace(id=chat_id, type="group"),
+        effective_user=types.SimpleNamespace(id=user_id),
+        message=FakeMessage(text),
+        update_id=update_id,
+        callback_query=None,
+        inline_query=None,
+    )
+
+
+def make_context(args=None):
+    return types.SimpleNamespace(args=list(args or []), user_data={}, bot=None)
+
+
+def write_config(chat_id: int, timetable=None, aliases=None):
+    bot.save_group_config(chat_id, {
+        "reminders_enabled": False,
+        "morning_reminder": "08:00",
+        "evening_reminder": "18:00",
+        "timezone": bot.DEFAULT_TIMEZONE,
+        "timetable": timetable or {},
+        "subject_aliases": aliases or {},
+    })
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """Run every test against an empty group_data with cold caches"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(bot.DATA_DIR)
+    bot.reload_data("test")
+    bot.chat_locks.clear()
+    bot.last_reminder_data.clear()
+    bot.reminder_retries.clear()
+    bot.dashboard_timers.clear()
+    for cache in (bot.rate_buckets, bot.recent_commands, bot.throttle_notices):
+        cache.clear()
+    bot.load_blob.cache_clear()
+    monkeypatch.setattr(bot, "app", None)
+    yield tmp_path
@@ -0,0 +1,54 @@
+import datetime
+import random
+import re
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import app as bot
+from conftest import write_config
+
+CHAT = 11
+UTC = datetime.timezone.utc
+
+
+def parse_offset(text: str) -> datetime.timedelta:
+    sign = -1 if text[0] == "-" else 1
+    return sign * datetime.timedelta(hours=int(text[1:3]), minutes=int(text[3:5]))
+
+
+def observances(feed: str):
+    """(utc start, offset) of every VTIMEZONE observance, in order"""
+    block = feed[feed.index("BEGIN:VTIMEZONE"):feed.index("END:VTIMEZONE")]
+    result = []
+    for start, offset_from, offset_to in re.findall(
+        r"DTSTART:(\d{8}T\d{6})\r\nTZOFFSETFROM:([+-]\d{4})\r\nTZOFFSETTO:([+-]\d{4})", block
+    ):
+        local = datetime.datetime.strptime(start, "%Y%m%dT%H%M%S").replace(tzinfo=UTC)
+        result.append((local - parse_offset(offset_from), parse_offset(offset_to)))
+    return result
+
+
+@pytest.mark.parametrize("zone_name", ["Europe/Berlin", "Asia/Yerevan", "America/Sao_Paulo", "Australia/Lord_Howe"])
+def test_vtimezone_matches_zoneinfo(zone_name):
+    write_config(CHAT, timetable={"Monday": [{"subject": "Math"}], "Tuesday": [{"subject": "Art", "week": "ч/н"}]})
+    config = bot.load_group_config(CHAT)
+    config["timezone"] = zone_name
+    bot.save_group_config(CHAT, config)
+    bot.chat_zones.clear()
+
+    today = datetime.date(2026, 10, 19)
+    feed = bot.render_calendar(CHAT, today).decode("utf-8")
+    assert f"DTSTART;TZID={zone_name}:20261019T093000" in feed
+    zone = ZoneInfo(zone_name)
+    found = observances(feed)
+    starts = [start for start, _ in found]
+    assert starts == sorted(starts)
+
+    # Every instant the lesson series can touch resolves to zoneinfo's offset
+    rng = random.Random(40)
+    first, last = starts[0], datetime.datetime(2028, 1, 1, tzinfo=UTC)
+    for _ in range(2000):
+        moment = first + (last - first) * rng.random()
+        offset = [offset for start, offset in found if start <= moment][-1]
+        assert offset == moment.astimezone(zone).utcoffset(), moment
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+import app as bot
+from conftest import make_context, make_update
+
+CHATS = 8
+ADDS_PER_CHAT = 250
+
+
+@pytest.mark.parametrize("storage_mode", ["json", "journal"])
+def test_concurrent_adds_are_not_lost(storage_mode, monkeypatch):
+    monkeypatch.setattr(bot, "STORAGE_MODE", storage_mode)
+    monkeypatch.setattr(bot, "JOURNAL_COMPACT_EVERY", 50)
+
+    async def add(chat_id: int, i: int):
+        args = f"Subject{i % 5} | task {chat_id}-{i} | +{i % 10}".split()
+        await bot.hw_quick_add(make_update(chat_id), make_context(args))
+
+    async def run():
+        await asyncio.gather(*(
+            add(chat_id, i) for i in range(ADDS_PER_CHAT) for chat_id in range(1, CHATS + 1)
+        ))
+
+    asyncio.run(run())
+
+    bot.reload_data("test")
+    for chat_id in range(1, CHATS + 1):
+        hw = bot.load_homework(chat_id)
+        tasks = sorted(bot.get_task_text(item) for items in hw.values() for item in items)
+        assert tasks == sorted(f"task {chat_id}-{i}" for i in range(ADDS_PER_CHAT))
+
+
+def test_concurrent_adds_and_removes_keep_other_tasks(monkeypatch):
+    chat_id = 1
+    for i in range(20):
+        asyncio.run(bot.hw_quick_add(make_update(chat_id), make_context(f"Keep | keep {i} | +1".split())))
+
+    async def run():
+        adds = [
+            bot.hw_quick_add(make_update(chat_id), make_context(f"Drop | drop {i} | +1".split()))
+            for i in range(200)
+        ]
+        removes = [bot.hw_remove(make_update(chat_id), make_context(["Drop", "1"])) for _ in range(10)]
+        await asyncio.gather(*adds, *removes)
+
+    asyncio.run(run())
+
+    hw = bot.load_homework(chat_id)
+    keep = sorted(bot.get_task_text(item) for item in hw.get("Keep", []))
+    assert keep == sorted(f"keep {i}" for i in range(20))
+    assert len(hw.get("Drop", [])) == 190
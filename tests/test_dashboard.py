@@ -0,0 +1,53 @@
+import asyncio
+import os
+
+import app as bot
+from conftest import write_config
+
+DASHBOARD_CHAT = 31
+PLAIN_CHAT = 32
+
+
+def add(chat_id: int, task: str):
+    hw = bot.load_homework(chat_id)
+    item = bot.make_task_item(task, "TBD", "2026-10-01")
+    bot.mutate_homework(chat_id, hw, {"op": "add", "subject": "Math", "item": item})
+
+
+def test_homework_writes_do_not_read_or_create_configs(monkeypatch):
+    write_config(DASHBOARD_CHAT)
+    config = bot.load_group_config(DASHBOARD_CHAT)
+    config["dashboard"] = {"message_id": 5}
+    bot.save_group_config(DASHBOARD_CHAT, config)
+    bot.get_dashboard_chats()
+
+    reads = []
+    load_group_config = bot.load_group_config
+    monkeypatch.setattr(bot, "load_group_config", lambda chat_id: reads.append(chat_id) or load_group_config(chat_id))
+
+    async def writes():
+        add(PLAIN_CHAT, "Ex 1")
+        add(DASHBOARD_CHAT, "Ex 1")
+        add(DASHBOARD_CHAT, "Ex 2")
+        scheduled = set(bot.dashboard_timers)
+        for task in bot.dashboard_timers.values():
+            task.cancel()
+        bot.dashboard_timers.clear()
+        return scheduled
+
+    assert asyncio.run(writes()) == {DASHBOARD_CHAT}
+    assert reads == []
+    # A chat that never had a config must not get one (and reminders, broadcasts) from a write
+    assert not os.path.exists(bot.get_config_file(PLAIN_CHAT))
+
+
+def test_dashboard_flag_follows_config_saves():
+    write_config(DASHBOARD_CHAT)
+    assert DASHBOARD_CHAT not in bot.get_dashboard_chats()
+    config = bot.load_group_config(DASHBOARD_CHAT)
+    config["dashboard"] = {"message_id": 5}
+    bot.save_group_config(DASHBOARD_CHAT, config)
+    assert DASHBOARD_CHAT in bot.get_dashboard_chats()
+    del config["dashboard"]
+    bot.save_group_config(DASHBOARD_CHAT, config)
+    assert DASHBOARD_CHAT not in bot.get_dashboard_chats()
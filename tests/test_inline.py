@@ -0,0 +1,28 @@
+import re
+
+import app as bot
+
+CHAT = 9
+
+
+def test_inline_homework_answer_fits_in_a_message():
+    hw = {}
+    for i in range(400):
+        hw.setdefault(f"Subject {i % 7} ✏️", []).append(
+            bot.make_task_item(f"Exercise {i}: read chapter {i} and answer the questions at the end", "TBD", "2026-10-01")
+        )
+    bot.save_homework(CHAT, hw)
+
+    text = bot.get_inline_answer(CHAT, "hw")
+    assert bot.message_length(text) <= bot.MAX_MESSAGE_LENGTH
+    shown = len(re.findall(r"^   `\d+` ", text, re.MULTILINE))
+    hidden = int(re.search(r"_\\\.\\\.\\\. (\d+) more_$", text).group(1))
+    assert shown > 0
+    assert shown + hidden == 400
+
+
+def test_short_list_is_not_cut():
+    bot.save_homework(CHAT, {"Math": [bot.make_task_item("Ex 1", "TBD", "2026-10-01")]})
+    text = bot.get_inline_answer(CHAT, "hw")
+    assert "more_" not in text
+    assert "Ex 1" in text
@@ -0,0 +1,139 @@
+import builtins
+import glob
+import os
+
+import pytest
+
+import app as bot
+
+CHAT = 42
+DUE = "2030-01-01"
+
+
+@pytest.fixture(autouse=True)
+def journal_mode(monkeypatch):
+    monkeypatch.setattr(bot, "STORAGE_MODE", "journal")
+    monkeypatch.setattr(bot, "JOURNAL_COMPACT_EVERY", 1000)
+
+
+def add(chat_id: int, subject: str, task: str):
+    hw = bot.load_homework(chat_id)
+    item = bot.make_task_item(task, DUE, "2029-12-01")
+    bot.mutate_homework(chat_id, hw, {"op": "add", "subject": subject, "item": item})
+
+
+def tasks_on_disk(chat_id: int):
+    """What a freshly started bot would see"""
+    bot.journal_state.clear()
+    hw = bot.load_homework(chat_id)
+    return [bot.get_task_text(item) for items in hw.values() for item in items]
+
+
+def test_every_crash_point_replays_a_prefix():
+    for i in range(5):
+        add(CHAT, "Math", f"task {i}")
+    journal = bot.get_journal_file(CHAT)
+    with open(journal, "rb") as f:
+        data = f.read()
+    line_ends = [i + 1 for i, byte in enumerate(data) if byte == ord("\n")]
+
+    # A crash can leave the journal cut at any byte
+    for cut in range(len(data) + 1):
+        with open(journal, "wb") as f:
+            f.write(data[:cut])
+        complete = sum(1 for end in line_ends if end <= cut)
+        assert tasks_on_disk(CHAT) == [f"task {i}" for i in range(complete)]
+        # The torn tail is gone, so the next append starts on a clean line
+        assert os.path.getsize(journal) == max([0] + [end for end in line_ends if end <= cut])
+
+    add(CHAT, "Math", "after crash")
+    assert tasks_on_disk(CHAT)[-1] == "after crash"
+
+
+def test_crash_between_snapshot_and_truncate_does_not_duplicate():
+    for i in range(3):
+        add(CHAT, "Math", f"task {i}")
+    journal = bot.get_journal_file(CHAT)
+    with open(journal, "rb") as f:
+        journal_before = f.read()
+
+    bot.compact_homework(CHAT, bot.load_homework(CHAT))
+    # Crash right after the snapshot rename: the journal was never emptied
+    with open(journal, "wb") as f:
+        f.write(journal_before)
+
+    assert tasks_on_disk(CHAT) == ["task 0", "task 1", "task 2"]
+    add(CHAT, "Math", "task 3")
+    assert tasks_on_disk(CHAT) == ["task 0", "task 1", "task 2", "task 3"]
+
+
+def test_corrupt_middle_record_stops_replay_without_deleting_later_records():
+    for i in range(4):
+        add(CHAT, "Math", f"task {i}")
+    journal = bot.get_journal_file(CHAT)
+    with open(journal, "rb") as f:
+        lines = f.read().splitlines(keepends=True)
+    lines[1] = b'{"op": "add", garbage\n'
+    with open(journal, "wb") as f:
+        f.writelines(lines)
+
+    # A read path replays up to the bad record and leaves the file as it is
+    assert tasks_on_disk(CHAT) == ["task 0"]
+    with open(journal, "rb") as f:
+        assert f.read().splitlines(keepends=True) == lines
+
+    # The next write keeps the damaged journal aside instead of appending behind it
+    add(CHAT, "Math", "new")
+    assert tasks_on_disk(CHAT) == ["task 0", "new"]
+    damaged = glob.glob(f"{journal}.damaged-*")
+    assert len(damaged) == 1
+    with open(damaged[0], "rb") as f:
+        assert f.read().splitlines(keepends=True) == lines
+
+
+class CountingFile:
+    def __init__(self, f, counter):
+        self.f = f
+        self.counter = counter
+
+    def write(self, data):
+        self.counter[0] += len(data.encode("utf-8") if isinstance(data, str) else data)
+        return self.f.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return self.f.__exit__(*exc)
+
+
+def bytes_written_for_adds(monkeypatch, mode: str, adds: int) -> int:
+    counter = [0]
+
+    def counting_open(file, mode_="r", *args, **kwargs):
+        f = builtins.open(file, mode_, *args, **kwargs)
+        return CountingFile(f, counter) if any(flag in mode_ for flag in "wa") else f
+
+    monkeypatch.setattr(bot, "STORAGE_MODE", mode)
+    monkeypatch.setattr(bot, "JOURNAL_COMPACT_EVERY", 200)
+    monkeypatch.setattr(bot, "open", counting_open, raising=False)
+    chat_id = {"json": 1, "journal": 2}[mode]
+    for i in range(adds):
+        add(chat_id, f"Subject {i % 8}", f"Exercise {i}: https://example.com/course/{i}/" + "x" * 120)
+    monkeypatch.delattr(bot, "open")
+    return counter[0]
+
+
+def test_journal_write_amplification(monkeypatch):
+    adds = 1000
+    json_bytes = bytes_written_for_adds(monkeypatch, "json", adds)
+    journal_bytes = bytes_written_for_adds(monkeypatch, "journal", adds)
+    print(f"\n{adds} adds: json mode wrote {json_bytes / 2 ** 20:.1f} MB, "
+          f"journal mode {journal_bytes / 2 ** 20:.1f} MB")
+
+    assert bot.load_homework(1) == bot.load_homework(2)
+    # json rewrites the whole file per add (quadratic), the journal appends one line
+    assert journal_bytes * 10 < json_bytes
@@ -0,0 +1,133 @@
+"""Property checks for parse_flexible_date over seeded random inputs"""
+import asyncio
+import datetime
+import random
+
+import pytest
+
+import app as bot
+from conftest import make_context, make_update, write_config
+
+CHAT = 77
+SEED = 20261019
+CASES = 500
+
+
+@pytest.fixture
+def rng():
+    return random.Random(SEED)
+
+
+def random_day(rng: random.Random) -> datetime.date:
+    return datetime.date(2000, 1, 1) + datetime.timedelta(days=rng.randrange(365 * 60))
+
+
+def noisy(rng: random.Random, text: str) -> str:
+    """Same input as a user might type it: random case and extra whitespace"""
+    text = "".join(ch.upper() if rng.random() < 0.5 else ch for ch in text)
+    spaces = lambda: " " * rng.randrange(3)  # noqa: E731
+    return spaces() + (spaces() + " ").join(text.split(" ")) + spaces()
+
+
+def test_keywords_and_relative_days(rng):
+    for _ in range(CASES):
+        today = random_day(rng)
+        keyword = rng.choice(sorted(bot.DATE_KEYWORDS))
+        expected = bot.DATE_KEYWORDS[keyword]
+        result = bot.parse_flexible_date(noisy(rng, keyword), today)
+        assert result == (expected if expected == "TBD" else today + datetime.timedelta(days=expected))
+
+        days = rng.randrange(1000)
+        assert bot.parse_flexible_date(f"+{days}", today) == today + datetime.timedelta(days=days)
+
+
+def test_iso_dates_round_trip(rng):
+    for _ in range(CASES):
+        day = random_day(rng)
+        assert bot.parse_flexible_date(day.isoformat(), random_day(rng)) == day
+
+
+def test_day_month_is_next_occurrence(rng):
+    for _ in range(CASES):
+        today = random_day(rng)
+        day, month = rng.randint(1, 31), rng.randint(1, 12)
+        text = f"{day:0{rng.randint(1, 2)}}{rng.choice('-/.')}{month:0{rng.randint(1, 2)}}"
+        try:
+            datetime.date(2000, month, day)
+        except ValueError:
+            # Never valid in any year, e.g. 31-04
+            with pytest.raises(ValueError):
+                bot.parse_flexible_date(text, today)
+            continue
+
+        result = bot.parse_flexible_date(text, today)
+        assert (result.day, result.month) == (day, month)
+        assert result >= today
+        # No earlier year would also have been on or after today
+        try:
+            assert datetime.date(result.year - 1, month, day) < today
+        except ValueError:
+            pass
+
+
+def test_weekdays_are_within_the_next_seven_days(rng):
+    names = sorted(bot.WEEKDAYS)
+    for _ in range(CASES):
+        today = random_day(rng)
+        name = rng.choice(names)
+        prefix = rng.choice(["", "on ", "в ", "next ", "след "])
+        result = bot.parse_flexible_date(noisy(rng, prefix + name), today)
+        assert result.weekday() == bot.WEEKDAYS[name]
+        assert 1 <= (result - today).days <= 7
+
+
+def random_number(rng: random.Random) -> str:
+    """Digit strings from 1 to 40 long, so huge values come up as often as small ones"""
+    return "".join(rng.choice("0123456789") for _ in range(rng.randint(1, 40)))
+
+
+def test_garbage_only_raises_value_error(rng):
+    alphabet = "abcxyz0123456789+-/. апрсլաբ"
+    templates = [
+        lambda: "".join(rng.choice(alphabet) for _ in range(rng.randrange(12))),
+        lambda: f"+{random_number(rng)}",
+        lambda: f"{random_number(rng)}{rng.choice('-/.')}{random_number(rng)}",
+        lambda: f"{random_number(rng)}-{random_number(rng)}-{random_number(rng)}",
+        lambda: f"next {random_number(rng)}",
+    ]
+    for _ in range(CASES * 4):
+        text = rng.choice(templates)()
+        try:
+            result = bot.parse_flexible_date(text, random_day(rng))
+        except ValueError:
+            continue
+        assert result == "TBD" or isinstance(result, datetime.date)
+
+
+def test_next_lesson_is_a_future_lesson_day(rng):
+    write_config(CHAT, timetable={
+        "Monday": [{"subject": "Python"}],
+        "Thursday": [{"subject": "Python"}, {"subject": "History"}],
+    })
+    for _ in range(CASES):
+        today = random_day(rng)
+        result = bot.parse_flexible_date(noisy(rng, rng.choice(["next python", "next py lesson", "на след пару по py"])), today, CHAT)
+        assert result.weekday() in (0, 3)
+        assert 1 <= (result - today).days <= 7
+
+
+def test_new_subject_invalidates_cached_prefix_lookup():
+    write_config(CHAT, timetable={"Monday": [{"subject": "Python"}]})
+    today = datetime.date(2026, 10, 19)
+    assert bot.parse_flexible_date("next p", today, CHAT) == datetime.date(2026, 10, 26)
+
+    bot.get_subject_registry(CHAT).canonical("Physics")
+    with pytest.raises(ValueError):
+        bot.parse_flexible_date("next p", today, CHAT)
+
+
+def test_out_of_range_offset_is_rejected_with_a_reply():
+    update = make_update(CHAT)
+    asyncio.run(bot.hw_quick_add(update, make_context("Python | x | +99999999".split())))
+    assert update.message.replies == ["Invalid date format"]
+    assert bot.load_homework(CHAT) == {}
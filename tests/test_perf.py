@@ -0,0 +1,182 @@
+"""Offline performance budgets on synthetic data, run with -s to see the numbers"""
+import asyncio
+import datetime
+import logging
+import time
+import tracemalloc
+import types
+
+import app as bot
+
+# Checked-in budgets, about 3x what was measured when they were set
+PERF_BUDGETS = {
+    "load_homework_ms": 0.3,      # one chat, PERF_TASKS tasks
+    "hw_list_ms": 2.0,            # render one chat
+    "hw_list_scaling": 6.0,       # 4x tasks, linear is ~4, quadratic ~16
+    "deadline_batch_ms": 5.0,     # format_deadline_status over 1000 tasks
+    "reminder_tick_ms": 150.0,    # cold tick, every chat due
+    "inline_cold_ms": 3.0,        # inline_query answering hw/today/next for one chat, nothing cached
+    "inline_cached_ms": 0.25,     # the same with the answers cached
+    "inline_cache_kb": 45.0,      # what the cached answers of one chat keep alive
+    "peak_memory_mb": 2.0,        # highest tracemalloc peak of the paths above
+}
+PERF_CHATS = 300
+PERF_TASKS = 60
+
+
+class PerfStubBot:
+    """Offline Bot stand-in that accepts and counts sends"""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, *args, **kwargs):
+        self.sent += 1
+
+
+def write_perf_data(today: datetime.date):
+    """PERF_CHATS chats with PERF_TASKS tasks each, every 10th task long enough for the blob store"""
+    for chat_id in range(1, PERF_CHATS + 1):
+        hw = {}
+        for i in range(PERF_TASKS):
+            task = f"Exercise {i} from chapter {i % 7}, pages {i * 3}-{i * 3 + 2}"
+            if i % 10 == 0:
+                task = (task + " with the full problem statement. ") * 8
+            due = "TBD" if i % 9 == 0 else (today + datetime.timedelta(days=i % 14 - 3)).isoformat()
+            hw.setdefault(f"Subject {i % 6}", []).append(bot.make_task_item(task, due, today.isoformat()))
+        bot.save_homework(chat_id, hw)
+
+
+class StubInlineQuery:
+    query = ""
+
+    def __init__(self):
+        self.answers = 0
+
+    async def answer(self, results, **kwargs):
+        assert len(results) == len(bot.INLINE_QUERIES)
+        self.answers += 1
+
+
+def set_reminder_times(at: str):
+    for chat_id in range(1, PERF_CHATS + 1):
+        bot.save_group_config(chat_id, {
+            "reminders_enabled": True,
+            "morning_reminder": at,
+            "evening_reminder": "23:59" if at != "23:59" else "00:00",
+            "timezone": bot.DEFAULT_TIMEZONE,
+            "timetable": bot.INITIAL_TIMETABLE,
+        })
+
+
+def time_ms(fn, repeat: int = 5) -> float:
+    """Best of repeat runs, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def test_perf_budgets(monkeypatch):
+    # Measure the tick's own work, not the send throttling
+    monkeypatch.setattr(bot, "REMINDER_RATE", 1e9)
+    stub = PerfStubBot()
+    monkeypatch.setattr(bot, "app", types.SimpleNamespace(bot=stub))
+
+    today = bot.chat_today()
+    write_perf_data(today)
+    chat_ids = range(1, PERF_CHATS + 1)
+    hws = {chat_id: bot.load_homework(chat_id) for chat_id in chat_ids}
+    big_hw = {subj: tasks * 4 for subj, tasks in hws[1].items()}
+    due_batch = [task["due"] for hw in list(hws.values())[:17] for tasks in hw.values() for task in tasks][:1000]
+
+    def load_all():
+        for chat_id in chat_ids:
+            bot.load_homework(chat_id)
+
+    def render_all():
+        for chat_id in chat_ids:
+            bot.render_homework_list(chat_id, hws[chat_id])
+
+    def deadline_batch():
+        now = bot.chat_now(1)
+        for due in due_batch:
+            bot.format_deadline_status(due, 1, now)
+
+    query = StubInlineQuery()
+    inline_update = types.SimpleNamespace(inline_query=query)
+
+    def inline_all():
+        async def answer_all():
+            for chat_id in chat_ids:
+                await bot.inline_query(inline_update, types.SimpleNamespace(user_data={"home_chat": chat_id}))
+        asyncio.run(answer_all())
+
+    def inline_cold():
+        bot.inline_answers.clear()
+        inline_all()
+
+    def reminder_tick() -> float:
+        """One cold tick with every chat due, in ms. Reminder times are set for the
+        current minute right before it and the tick is redone if the minute rolled over."""
+        while True:
+            minute = bot.chat_now().strftime("%H:%M")
+            set_reminder_times(minute)
+            bot.reminder_schedule = None
+            bot.last_reminder_data.clear()
+            bot.prerendered_digests.clear()
+            bot.chat_zones.clear()
+            sent = stub.sent
+            started = time.perf_counter()
+            asyncio.run(bot.check_and_send_reminders())
+            elapsed = (time.perf_counter() - started) * 1000
+            if bot.chat_now().strftime("%H:%M") == minute:
+                assert stub.sent - sent == PERF_CHATS
+                return elapsed
+
+    paths = {
+        "load_homework_ms": (load_all, PERF_CHATS),
+        "hw_list_ms": (render_all, PERF_CHATS),
+        "deadline_batch_ms": (deadline_batch, 1),
+    }
+    inline_paths = {
+        "inline_cold_ms": (inline_cold, PERF_CHATS),
+        "inline_cached_ms": (inline_all, PERF_CHATS),
+    }
+
+    logging.disable(logging.INFO)
+    try:
+        results = {name: time_ms(fn, 3) / per for name, (fn, per) in {**paths, **inline_paths}.items()}
+        results["reminder_tick_ms"] = min(reminder_tick() for _ in range(3))
+        # Uncapped, the 4096-char message limit would flatten the growth being measured
+        small = time_ms(lambda: bot.render_homework_list(1, hws[1], limit=10 ** 9), 20)
+        results["hw_list_scaling"] = time_ms(lambda: bot.render_homework_list(1, big_hw, limit=10 ** 9), 20) / small
+
+        paths["reminder_tick_ms"] = (reminder_tick, 1)
+        peaks = {}
+        tracemalloc.start()
+        try:
+            for name, (fn, _) in paths.items():
+                tracemalloc.reset_peak()
+                fn()
+                peaks[name] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            # The inline answer cache is meant to stay alive, so it is budgeted on its own
+            before = tracemalloc.get_traced_memory()[0]
+            inline_cold()
+            results["inline_cache_kb"] = (tracemalloc.get_traced_memory()[0] - before) / PERF_CHATS / 1024
+        finally:
+            tracemalloc.stop()
+        results["peak_memory_mb"] = max(peaks.values())
+    finally:
+        logging.disable(logging.NOTSET)
+
+    print(f"\nperf check: {PERF_CHATS} chats x {PERF_TASKS} tasks, {PERF_CHATS} reminders per tick")
+    for name, budget in PERF_BUDGETS.items():
+        print(f"  {name:<20} {results[name]:9.3f}  budget {budget:9.3f}")
+    for name, peak in peaks.items():
+        print(f"  peak during {name:<20} {peak:7.2f} MB")
+
+    over = {name: results[name] for name, budget in PERF_BUDGETS.items() if results[name] > budget}
+    assert not over, f"over budget: {over}"
@@ -0,0 +1,28 @@
+import cProfile
+import pstats
+import types
+
+import app as bot
+
+
+def render_report(monkeypatch) -> str:
+    monkeypatch.setattr(bot, "app", types.SimpleNamespace(update_processor=bot.ChatUpdateProcessor()))
+    profiler = cProfile.Profile()
+    profiler.enable()
+    profiler.disable()
+    return bot.format_perf_report(1, pstats.Stats(profiler), [], {}, dict(bot.storage_io))
+
+
+def test_report_includes_rate_limit_counts(monkeypatch):
+    monkeypatch.setattr(bot, "rate_limit_metrics", {"allowed": 40, "coalesced": 3, "throttled": 2, "dropped": 5})
+    monkeypatch.setattr(bot, "rate_limit_by_command", {"hw_list": 6, "calendar": 1})
+    report = render_report(monkeypatch)
+    assert "Rate limits since start: 40 allowed, 3 coalesced, 2 throttled, 5 dropped" in report
+    assert "limited most: /hw_list 6, /calendar 1" in report
+
+
+def test_report_includes_reminder_totals(monkeypatch):
+    monkeypatch.setattr(bot, "reminder_latency", {"fires": 4, "delivered": 900, "failed": 2, "max_ms": 812.4})
+    bot.reminder_retries["1_08:00_2026-10-19"] = (1, "morning", None, None)
+    report = render_report(monkeypatch)
+    assert "Reminders since start: 4 fires, 900 delivered, 2 failed, 1 waiting to retry, max fire-to-delivery 812 ms" in report
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+import app as bot
+from conftest import make_context, make_update, write_config
+
+CHAT = 21
+hw_list = bot.rate_limited("hw_list", bot.hw_list)
+
+
+@pytest.fixture(autouse=True)
+def chat_with_homework(data_dir):
+    write_config(CHAT)
+    bot.save_homework(CHAT, {"Math": [bot.make_task_item("Ex 1", "TBD", "2026-10-01")]})
+
+
+def run(handler, user_id: int, args=()):
+    update = make_update(CHAT, user_id=user_id)
+    asyncio.run(handler(update, make_context(args)))
+    return update.message.replies
+
+
+def test_identical_list_in_the_window_is_coalesced():
+    assert len(run(hw_list, user_id=1)) == 1
+    assert run(hw_list, user_id=2) == []
+    assert bot.rate_limit_metrics["coalesced"] >= 1
+
+
+def test_list_after_add_is_answered_with_the_change():
+    assert len(run(hw_list, user_id=1)) == 1
+
+    run(bot.hw_quick_add, user_id=2, args="Math | Ex 2 | TBD".split())
+    replies = run(hw_list, user_id=2)
+    assert len(replies) == 1
+    assert "Ex 2" in replies[0]
@@ -0,0 +1,97 @@
+import asyncio
+import datetime
+import types
+
+import pytest
+from telegram.error import Forbidden, RetryAfter, TimedOut
+
+import app as bot
+
+DAY = datetime.date(2026, 10, 19)
+FIRE_AT = datetime.datetime.now(datetime.timezone.utc).replace(second=0, microsecond=0)
+
+
+class FlakyBot:
+    """send_message that fails a scripted number of times per chat"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.sent = []
+        self.active = 0
+        self.max_active = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.001)
+            script = self.failures.get(chat_id, [])
+            if script:
+                raise script.pop(0)
+            self.sent.append(chat_id)
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def flaky(monkeypatch):
+    def install(failures):
+        stub = FlakyBot(failures)
+        monkeypatch.setattr(bot, "app", types.SimpleNamespace(bot=stub))
+        return stub
+
+    sleep = asyncio.sleep
+    # Backoff between retries should not slow the tests down
+    monkeypatch.setattr(bot.asyncio, "sleep", lambda delay, *args: sleep(0, *args))
+    monkeypatch.setattr(bot, "REMINDER_RATE", 1000.0)
+    return install
+
+
+def due_reminders(chat_ids):
+    due = []
+    for chat_id in chat_ids:
+        bot.prerendered_digests[(chat_id, "morning", DAY.isoformat())] = f"hello {chat_id}"
+        due.append((chat_id, "morning", DAY, f"{chat_id}_08:00_{DAY.isoformat()}"))
+    return due
+
+
+def test_dispatch_is_bounded_and_retries_transient_errors(flaky):
+    chats = range(1, 61)
+    stub = flaky({
+        **{chat_id: [TimedOut()] for chat_id in range(1, 11)},
+        **{chat_id: [RetryAfter(0)] for chat_id in range(11, 21)},
+        21: [Forbidden("blocked")],
+    })
+    asyncio.run(bot.dispatch_reminders(due_reminders(chats), FIRE_AT))
+
+    assert stub.max_active <= bot.REMINDER_CONCURRENCY
+    assert sorted(stub.sent) == [chat_id for chat_id in chats if chat_id != 21]
+    assert len(bot.last_reminder_data) == 60
+    assert not bot.reminder_retries
+
+
+def test_failed_reminder_is_sent_next_minute(flaky):
+    stub = flaky({1: [TimedOut()] * 3, 2: [RetryAfter(0)] * 3})
+    due = due_reminders([1, 2, 3])
+    asyncio.run(bot.dispatch_reminders(due, FIRE_AT))
+
+    assert stub.sent == [3]
+    assert set(bot.reminder_retries) == {due[0][3], due[1][3]}
+    assert due[0][3] not in bot.last_reminder_data
+
+    # No config files: the next check only has the retries to send
+    asyncio.run(bot.check_and_send_reminders())
+    assert sorted(stub.sent) == [1, 2, 3]
+    assert not bot.reminder_retries
+    assert {key for _, _, _, key in due} <= set(bot.last_reminder_data)
+
+
+def test_retries_give_up_after_the_window(flaky):
+    stub = flaky({})
+    old_fire = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=bot.REMINDER_RETRY_MINUTES + 2)
+    (reminder,) = due_reminders([1])
+    bot.reminder_retries[reminder[3]] = (1, "morning", DAY, old_fire)
+
+    asyncio.run(bot.check_and_send_reminders())
+    assert stub.sent == []
+    assert not bot.reminder_retries
@@ -0,0 +1,113 @@
+import asyncio
+import random
+import re
+import time
+
+import pytest
+
+import app as bot
+from conftest import make_context, make_update, write_config
+
+CHAT = 51
+SUBJECTS = ["Math", "Physics", "History", "Art"]
+
+
+@pytest.fixture(autouse=True)
+def chat_config(data_dir):
+    write_config(CHAT)
+
+
+def run(handler, args):
+    update = make_update(CHAT)
+    asyncio.run(handler(update, make_context(args)))
+    return update.message.replies
+
+
+def list_ids():
+    """task text -> (subject_id, task_id) as /hw_list shows them"""
+    ids = {}
+    subject_id = None
+    for line in bot.render_homework_list(CHAT, bot.load_homework(CHAT), limit=10 ** 9).splitlines():
+        header = re.match(r"^\*(\d+)\\\. .*\*$", line)
+        if header:
+            subject_id = int(header.group(1))
+            continue
+        task = re.match(r"^   `(\d+)` (.*) TBD$", line)
+        if task:
+            ids[task.group(2)] = (subject_id, int(task.group(1)))
+    return ids
+
+
+def search_ids(text: str):
+    results = bot.get_search_index(CHAT).search(text, limit=1)
+    assert results, text
+    subject_id, task_id, _, task = results[0]
+    assert bot.get_task_text(task) == text
+    return subject_id, task_id
+
+
+def test_search_ids_match_list_through_adds_and_removes():
+    rng = random.Random(33)
+    live = []
+    bot.get_search_index(CHAT)  # built up front so every change goes through the in-place updates
+    for n in range(300):
+        if live and rng.random() < 0.35:
+            # Remove by the IDs search reports, which must hit exactly that task
+            text = live.pop(rng.randrange(len(live)))
+            subject_id, task_id = search_ids(text)
+            assert run(bot.hw_remove, [str(subject_id), str(task_id)])[0].startswith("✓ Removed")
+        else:
+            text = f"task w{n}"
+            run(bot.hw_quick_add, f"{rng.choice(SUBJECTS)} | {text} | TBD".split())
+            live.append(text)
+
+        if n % 25 == 0:
+            expected = list_ids()
+            assert sorted(expected) == sorted(live)
+            for text in live:
+                assert search_ids(text) == expected[text]
+
+    stored = [bot.get_task_text(task) for tasks in bot.load_homework(CHAT).values() for task in tasks]
+    assert sorted(stored) == sorted(live)
+
+
+def test_index_is_rebuilt_after_clean():
+    hw = {}
+    for n in range(20):
+        hw.setdefault(SUBJECTS[n % 3], []).append(bot.make_task_item(f"task w{n}", "TBD", "2026-10-01"))
+    # Long-overdue tasks in front shift the IDs of the rest once /hw_clean drops them,
+    # and Art disappears, which renumbers the subjects too
+    for n in range(20, 30):
+        hw.setdefault(SUBJECTS[n % 2], []).insert(0, bot.make_task_item(f"task w{n}", "2000-01-01", "2000-01-01"))
+    hw["Art"] = [bot.make_task_item("task w99", "2000-01-01", "2000-01-01")]
+    bot.save_homework(CHAT, hw)
+
+    assert bot.get_search_index(CHAT).search("w99")
+    assert run(bot.hw_clean, [])[0] == "✓ Cleaned 11 old items"
+
+    assert bot.get_search_index(CHAT).search("w99") == []
+    expected = list_ids()
+    assert len(expected) == 20
+    for text, ids in expected.items():
+        assert search_ids(text) == ids
+
+
+def test_search_on_3000_tasks_is_sub_millisecond():
+    rng = random.Random(3000)
+    words = [f"word{i}" for i in range(400)]
+    hw = {}
+    for n in range(3000):
+        text = " ".join(rng.choice(words) for _ in range(12))
+        hw.setdefault(f"Subject {n % 12}", []).append(bot.make_task_item(text, "TBD", "2026-10-01"))
+    bot.save_homework(CHAT, hw)
+    index = bot.get_search_index(CHAT)
+
+    queries = [" ".join(rng.sample(words, 2)) for _ in range(50)]
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for query in queries:
+            index.search(query)
+        best = min(best, (time.perf_counter() - started) / len(queries) * 1000)
+    print(f"\nsearch over 3000 tasks: {best:.3f} ms per two-word query")
+    assert best < 1.0
@@ -0,0 +1,46 @@
+import asyncio
+
+import app as bot
+from conftest import make_context, make_update, write_config
+
+CHAT = 5725090631
+
+
+def quick_add(chat_id: int, text: str):
+    asyncio.run(bot.hw_quick_add(make_update(chat_id), make_context(text.split())))
+
+
+def test_existing_homework_key_stays_canonical():
+    bot.save_json_file(bot.get_homework_file(CHAT), {"python": [{"task": "Ex 1", "due": "TBD", "added": "2026-10-01"}]})
+    write_config(
+        CHAT,
+        timetable={"Monday": [{"time": "09:00", "subject": "Python"}]},
+        aliases={"py": "Python"},
+    )
+
+    registry = bot.get_subject_registry(CHAT)
+    assert registry.canonical("Python") == "python"
+    assert registry.resolve("PY") == "python"
+
+    quick_add(CHAT, "Python | Ex 2 | TBD")
+    quick_add(CHAT, "py | Ex 3 | TBD")
+    hw = bot.load_homework(CHAT)
+    assert list(hw) == ["python"]
+    assert [item["task"] for item in hw["python"]] == ["Ex 1", "Ex 2", "Ex 3"]
+
+
+def test_punctuation_keeps_subjects_apart():
+    for subject in ("C", "C++", "C#"):
+        quick_add(CHAT, f"{subject} | Lab | TBD")
+    quick_add(CHAT, "c++ | Lab 2 | TBD")
+
+    hw = bot.load_homework(CHAT)
+    assert sorted(hw) == ["C", "C#", "C++"]
+    assert len(hw["C++"]) == 2
+
+
+def test_whitespace_and_case_are_ignored():
+    registry = bot.SubjectRegistry()
+    assert registry.canonical(" Linear Algebra ") == "Linear Algebra"
+    assert registry.canonical("linear\t  ALGEBRA") == "Linear Algebra"
+    assert registry.canonical("Linear-Algebra") == "Linear-Algebra"
@@ -0,0 +1,131 @@
+import asyncio
+import datetime
+import time
+
+import pytest
+from telegram import Chat, Message, Update
+from telegram.ext import BaseUpdateProcessor, SimpleUpdateProcessor
+
+import app as bot
+
+CHATS = 20
+UPDATES_PER_CHAT = 20
+HANDLER_SECONDS = 0.005
+
+
+def chat_update(update_id: int, chat_id: int) -> Update:
+    chat = Chat(chat_id, Chat.GROUP)
+    message = Message(update_id, datetime.datetime.now(datetime.timezone.utc), chat, text="/hw_list")
+    return Update(update_id, message=message)
+
+
+async def process_all(processor: BaseUpdateProcessor):
+    """Feed updates round-robin over the chats like PTB does: one task per update"""
+    seen = {chat_id: [] for chat_id in range(1, CHATS + 1)}
+    active = 0
+    max_active = 0
+
+    async def handle(chat_id: int, n: int):
+        nonlocal active, max_active
+        active += 1
+        max_active = max(max_active, active)
+        await asyncio.sleep(HANDLER_SECONDS)
+        seen[chat_id].append(n)
+        active -= 1
+
+    tasks = []
+    update_id = 0
+    for n in range(UPDATES_PER_CHAT):
+        for chat_id in range(1, CHATS + 1):
+            update_id += 1
+            update = chat_update(update_id, chat_id)
+            tasks.append(asyncio.create_task(processor.process_update(update, handle(chat_id, n))))
+    await asyncio.gather(*tasks)
+    return seen, max_active
+
+
+def test_chat_order_is_kept_and_active_updates_are_bounded():
+    processor = bot.ChatUpdateProcessor(max_active=8, max_admitted=64)
+    seen, max_active = asyncio.run(process_all(processor))
+
+    assert all(order == list(range(UPDATES_PER_CHAT)) for order in seen.values())
+    assert max_active <= 8
+    metrics = processor.metrics()
+    assert metrics["pending"] == 0
+    assert metrics["max_pending"] == CHATS * UPDATES_PER_CHAT
+    assert metrics["processed"] == CHATS * UPDATES_PER_CHAT
+
+
+def test_multi_chat_throughput_beats_sequential_processing():
+    started = time.perf_counter()
+    asyncio.run(process_all(bot.ChatUpdateProcessor(max_active=8, max_admitted=256)))
+    concurrent = time.perf_counter() - started
+
+    # What the bot did before: one update at a time
+    started = time.perf_counter()
+    asyncio.run(process_all(SimpleUpdateProcessor(1)))
+    sequential = time.perf_counter() - started
+
+    print(f"\n{CHATS * UPDATES_PER_CHAT} updates over {CHATS} chats: "
+          f"per-chat processor {concurrent:.2f}s, sequential {sequential:.2f}s")
+    assert concurrent < sequential / 3
+
+
+class QueueApplication:
+    """Just the parts of Application graceful_shutdown touches, with PTB's fetch loop:
+    one task per update, task_done() once the update was processed"""
+
+    def __init__(self, handler_seconds: float):
+        self.updater = None
+        self.update_queue = asyncio.Queue()
+        self.update_processor = bot.ChatUpdateProcessor(max_active=4, max_admitted=64)
+        self.handler_seconds = handler_seconds
+        self.done = 0
+        self.stopped_with_done = None
+        self.fetcher = asyncio.create_task(self.fetch())
+
+    async def handle(self):
+        await asyncio.sleep(self.handler_seconds)
+        self.done += 1
+
+    async def process(self, update):
+        await self.update_processor.process_update(update, self.handle())
+        self.update_queue.task_done()
+
+    async def fetch(self):
+        while True:
+            update = await self.update_queue.get()
+            asyncio.create_task(self.process(update))
+
+    def stop_running(self):
+        self.stopped_with_done = self.done
+        self.fetcher.cancel()
+
+
+def run_shutdown(monkeypatch, handler_seconds: float, timeout: float):
+    monkeypatch.setattr(bot, "SHUTDOWN_TIMEOUT", timeout)
+
+    async def scenario():
+        monkeypatch.setattr(bot, "shutdown_event", asyncio.Event())
+        application = QueueApplication(handler_seconds)
+        for update_id in range(1, 41):
+            application.update_queue.put_nowait(chat_update(update_id, update_id % 5))
+        await asyncio.sleep(0)
+        await bot.graceful_shutdown(application)
+        return application
+
+    return asyncio.run(scenario())
+
+
+def test_shutdown_drains_queued_and_running_updates(monkeypatch):
+    application = run_shutdown(monkeypatch, handler_seconds=0.01, timeout=5)
+    assert application.stopped_with_done == 40
+
+
+# Updates still waiting for a slot are cancelled with their handler coroutines unstarted
+@pytest.mark.filterwarnings("ignore:coroutine .* was never awaited")
+def test_shutdown_stops_at_the_deadline(monkeypatch):
+    started = time.perf_counter()
+    application = run_shutdown(monkeypatch, handler_seconds=10, timeout=0.2)
+    assert time.perf_counter() - started < 2
+    assert application.stopped_with_done == 0